@@ -1,35 +1,74 @@
-from config import TEST_LLMs_API_ACCESS_TOKEN, TEST_LLMs_REST_API_URL
-from ASUllmAPI import ModelConfig
+from model_registry import ModelSelector
 from prompt_builder import build_bot_response_classification_prompt
 from input_processing import (
     input_reader, 
     process_input_with_all_columns, 
     enhance_dataframe_with_analysis, 
-    save_enhanced_dataframe
+    save_enhanced_dataframe,
+    load_watermarks,
+    save_watermarks,
+    select_new_interactions,
+    update_watermarks,
+    default_watermark_path
 )
-from llm_utils import process_llm_response
+from llm_scheduler import get_scheduler, LLMRequest
+from llm_utils import enable_hedging
+from dry_run import run_dry_run
 import pandas as pd
+import os
+import sys
 import time
+from functools import partial
 
 if __name__ == '__main__':
     # Start timing
     start_time = time.time()
     print("=== Bot Response Processor Started ===")
     
-    # define the model
-    model = ModelConfig(name="gpt4_1",  #llama3_2-90b
-                        provider="openai",  #aws
-                        access_token=TEST_LLMs_API_ACCESS_TOKEN,
-                        api_url=TEST_LLMs_REST_API_URL)
+    # define the model (fastest healthy model from model_registry.QUALITY_ALLOWLIST)
+    model = ModelSelector()
 
     # Read the input file with all columns preserved
     input_file_path = "Input/Chronicles_sequential_interactions.csv"  # Updated to use new format file
+    output_path = "Output/Chronicles_bot_labels.xlsx" #change the output file name here
+    incremental = False  # set to True to only label bot responses added since the last run (needs the new input format)
+    if incremental and not output_path.endswith('.csv'):
+        # Excel files can't be appended to; a .csv output only writes the new rows each run
+        output_path = os.path.splitext(output_path)[0] + ".csv"
+        print(f"Incremental mode writes to {output_path}")
+    hedging = False  # set to True to send a duplicate request for calls slower than the observed p95
+    dry_run = False  # set to True to label a sample and project time, calls and cost for the full file
+    if hedging:
+        hedger = enable_hedging(hedge_budget=0.05)
     original_df = process_input_with_all_columns(input_file_path)
     
-    # Extract bot responses for processing
-    bot_responses = input_reader(input_file_path)
+    if dry_run:
+        def label_sample(sample_df):
+            if 'Interaction Type' in sample_df.columns:
+                sample_bots = sample_df[sample_df['Interaction Type'] == 'Bot Response']
+                sample = zip(sample_bots['Interaction ID'], sample_bots['Text'])
+            else:
+                # Old format: every row's 'Bot Response' column is labeled
+                sample = ((f"response_{i+1}", response) for i, response in enumerate(sample_df['Bot Response']))
+            get_scheduler().run_batch(model, [
+                LLMRequest(partial(build_bot_response_classification_prompt, bot_response=response), "bot", interaction_id, response)
+                for interaction_id, response in sample
+            ])
+        
+        run_dry_run(original_df, label_sample, "bot", model=model)
+        sys.exit(0)
+    
+    if incremental:
+        # Keep only the rows past each user's watermark from the previous run
+        watermark_path = default_watermark_path(output_path)
+        watermarks = load_watermarks(watermark_path)
+        original_df = select_new_interactions(original_df, watermarks)
+        print(f"Incremental mode: {len(original_df)} new rows past watermarks for {len(watermarks)} known users")
+        bot_responses = original_df[original_df['Interaction Type'] == 'Bot Response']['Text'].tolist()
+    else:
+        # Extract bot responses for processing
+        bot_responses = input_reader(input_file_path)
 
-    results = []
     print(f"Processing {len(bot_responses)} bot responses...")
     
     # Get bot response rows for better tracking
@@ -37,25 +76,30 @@ if __name__ == '__main__':
         bot_response_rows = original_df[original_df['Interaction Type'] == 'Bot Response']
         print(f"Found {len(bot_response_rows)} bot response interactions")
     
+    requests = []
     for i, response in enumerate(bot_responses):
-        print(f"Processing response {i+1}/{len(bot_responses)}")
         if 'Interaction Type' in original_df.columns:
             interaction_id = bot_response_rows.iloc[i]['Interaction ID'] if i < len(bot_response_rows) else f"response_{i+1}"
-            print(f"Interaction ID: {interaction_id}")
         else:
             interaction_id = f"response_{i+1}"
-        print(f"Response: {response[:100]}...")  # Show first 100 chars for progress tracking
         
-        llm_prompt = build_bot_response_classification_prompt(bot_response=response)
-        parsed = process_llm_response(model, llm_prompt, "bot", interaction_id, response)
-        results.append(parsed)
+        # The prompt is built when a worker takes the call
+        llm_prompt = partial(build_bot_response_classification_prompt, bot_response=response)
+        requests.append(LLMRequest(llm_prompt, "bot", interaction_id, response))
+    
+    # Run the calls concurrently, longest prompts first; results keep the input order
+    results = get_scheduler().run_batch(model, requests)
+    if hedging:
+        hedger.report()
 
     # Enhance the original DataFrame with analysis results
     enhanced_df = enhance_dataframe_with_analysis(original_df, results)
     
     # Save the enhanced DataFrame to Excel
-    output_path = "Output/Chronicles_bot_labels.xlsx" #change the output file name here
-    save_enhanced_dataframe(enhanced_df, output_path)
+    save_enhanced_dataframe(enhanced_df, output_path, append=incremental)
+    if incremental:
+        save_watermarks(watermark_path, update_watermarks(original_df, watermarks))
+        print(f"Watermarks saved to {watermark_path}")
     
     # Calculate and display execution time
     end_time = time.time()
@@ -0,0 +1,229 @@
+"""
+Combined response processor for labeling bot and student turns together.
+Each paired turn is labeled with a single LLM call that returns both the bot's Socratic
+label and the student's engagement labels; only unpaired bot responses get a bot-only call.
+"""
+
+import os
+import time
+import pandas as pd
+from typing import Dict, List, Tuple
+from functools import partial
+from prompt_builder import build_bot_response_classification_prompt, build_combined_classification_prompt
+from llm_utils import split_combined_response
+from llm_scheduler import LLMScheduler, LLMRequest, get_scheduler, PRIORITY_BULK
+from input_processing import (
+    enhance_dataframe_with_analysis,
+    load_watermarks,
+    save_watermarks,
+    select_new_interactions,
+    default_watermark_path
+)
+from dry_run import run_dry_run
+from student_response_processor import (
+    read_input_file,
+    pair_bot_student_interactions,
+    paired_watermarks,
+    pair_llm_request,
+    enhance_dataframe_with_student_analysis,
+    PairedInteraction
+)
+
+
+def analyze_pairs_combined_with_llm(paired_interactions: List[PairedInteraction], model,
+                                    scheduler: LLMScheduler = None, priority: int = PRIORITY_BULK) -> Tuple[Dict[str, Dict[str, any]], Dict[str, Dict[str, any]]]:
+    """
+    Analyze each bot-student pair with one LLM call and split the result.
+
+    Args:
+        paired_interactions: List of paired bot-student interactions
+        model: The LLM model configuration
+        scheduler: Scheduler used to run the LLM calls (defaults to the shared one)
+        priority: Queue priority, e.g. PRIORITY_INTERACTIVE to run ahead of bulk batches
+            queued on the same scheduler in this process
+
+    Returns:
+        Tuple of dictionaries mapping bot interaction IDs to bot results and
+        student interaction IDs to student results
+    """
+    scheduler = scheduler or get_scheduler()
+    bot_analysis_results = {}
+    student_analysis_results = {}
+
+    print(f"\n=== Analyzing Bot-Student Pairs with LLM ===")
+    print(f"Processing {len(paired_interactions)} bot-student pairs...")
+
+    requests = [pair_llm_request(pair, build_combined_classification_prompt, "combined")
+                for pair in paired_interactions]
+    results = scheduler.run_batch(model, requests, priority)
+
+    for pair, result in zip(paired_interactions, results):
+        bot_result, student_result = split_combined_response(result, pair['bot_text'], pair['student_text'])
+        bot_analysis_results[pair['bot_interaction_id']] = bot_result
+        student_analysis_results[pair['student_interaction_id']] = student_result
+
+    print(f"✓ Completed combined LLM analysis for {len(paired_interactions)} pairs")
+    return bot_analysis_results, student_analysis_results
+
+
+def analyze_unpaired_bot_responses_with_llm(df: pd.DataFrame, bot_analysis_results: Dict[str, Dict[str, any]], model,
+                                            scheduler: LLMScheduler = None, priority: int = PRIORITY_BULK) -> Dict[str, Dict[str, any]]:
+    """
+    Analyze the bot responses that were not covered by a pair (e.g. each user's last turn).
+
+    Args:
+        df: DataFrame containing the interactions to label
+        bot_analysis_results: Bot results already obtained from combined calls
+        model: The LLM model configuration
+        scheduler: Scheduler used to run the LLM calls (defaults to the shared one)
+        priority: Queue priority, e.g. PRIORITY_INTERACTIVE to run ahead of bulk batches
+            queued on the same scheduler in this process
+
+    Returns:
+        Dictionary mapping bot interaction IDs to bot results, including the existing ones
+    """
+    scheduler = scheduler or get_scheduler()
+    bot_rows = df[df['Interaction Type'] == 'Bot Response']
+    unpaired_rows = bot_rows[~bot_rows['Interaction ID'].isin(list(bot_analysis_results))]
+
+    print(f"\n=== Analyzing Unpaired Bot Responses with LLM ===")
+    print(f"Processing {len(unpaired_rows)} unpaired bot responses...")
+
+    requests = [
+        LLMRequest(partial(build_bot_response_classification_prompt, bot_response=response), "bot", interaction_id, response)
+        for interaction_id, response in zip(unpaired_rows['Interaction ID'], unpaired_rows['Text'])
+    ]
+    results = dict(bot_analysis_results)
+    results.update(zip(unpaired_rows['Interaction ID'], scheduler.run_batch(model, requests, priority)))
+
+    return results
+
+
+def process_all_users_combined_analysis(input_file_path: str, model, output_file_path: str = "Output/all_users_combined_analysis.csv",
+                                        incremental: bool = False, watermark_path: str = None,
+                                        dry_run: bool = False, sample_fraction: float = 0.05) -> pd.DataFrame:
+    """
+    Label all users' bot and student turns, using one LLM call per paired turn, and output to CSV.
+    The output has the bot analysis columns on bot rows and the student analysis columns
+    on student rows.
+
+    In incremental mode the watermark is each user's last paired student query, so rows
+    after it are written (and labeled) by a later run once their pair exists.
+
+    Args:
+        input_file_path: Path to the input CSV file
+        model: The LLM model configuration
+        output_file_path: Path where to save the CSV file
+        incremental: If True, only process interactions added since the previous run
+        watermark_path: Path to the watermark JSON file (defaults to one next to the output file)
+        dry_run: If True, label a stratified sample of users and project the full run
+            instead of processing the whole file (nothing is written)
+        sample_fraction: Fraction of users sampled in dry-run mode
+
+    Returns:
+        Enhanced DataFrame with bot and student analysis (only the new rows in incremental mode,
+        a one-row projection in dry-run mode)
+    """
+    start_time = time.time()
+    print("=== Processing All Users Combined Bot and Student Analysis ===")
+
+    print(f"Reading input file: {input_file_path}")
+    df = read_input_file(input_file_path)
+    print(f"Total rows in dataset: {len(df)}")
+
+    # Check if required columns exist
+    required_columns = ['Asurite', 'Interaction ID', 'Interaction Type', 'Text']
+    missing_columns = [col for col in required_columns if col not in df.columns]
+
+    if missing_columns:
+        print(f"Error: Missing required columns: {missing_columns}")
+        return df
+
+    if dry_run:
+        def label_sample(sample_df):
+            bot_results, _ = analyze_pairs_combined_with_llm(pair_bot_student_interactions(sample_df), model)
+            analyze_unpaired_bot_responses_with_llm(sample_df, bot_results, model)
+
+        projection = run_dry_run(df, label_sample, "combined", sample_fraction, model=model)
+        return pd.DataFrame([projection])
+
+    # Pair bot and student interactions (past the stored watermarks) and label each pair with one call
+    watermarks = None
+    if incremental:
+        watermark_path = watermark_path or default_watermark_path(output_file_path)
+        watermarks = load_watermarks(watermark_path)
+        print(f"Incremental mode: {len(watermarks)} known users")
+
+    print(f"\n=== Pairing Bot and Student Interactions for All Users ===")
+    paired_interactions = pair_bot_student_interactions(df, watermarks)
+    print(f"Found {len(paired_interactions)} total paired interactions across all users")
+
+    output_df = df
+    if incremental:
+        # Output rows up to each user's last paired student query; later rows wait for their pair
+        new_watermarks = paired_watermarks(paired_interactions, watermarks)
+        output_df = select_new_interactions(df, watermarks, upto=new_watermarks)
+        print(f"Incremental mode: {len(output_df)} new rows up to the last paired student query")
+        if not paired_interactions:
+            print("No new paired interactions since the last run.")
+            return output_df
+
+    bot_analysis_results, student_analysis_results = analyze_pairs_combined_with_llm(paired_interactions, model)
+    paired_bot_count = len(bot_analysis_results)
+    bot_analysis_results = analyze_unpaired_bot_responses_with_llm(output_df, bot_analysis_results, model)
+    unpaired_bot_count = len(bot_analysis_results) - paired_bot_count
+
+    # Enhance DataFrame with analysis results, bot results in bot row order
+    print(f"\n=== Enhancing DataFrame with Analysis Results ===")
+    bot_row_ids = output_df.loc[output_df['Interaction Type'] == 'Bot Response', 'Interaction ID']
+    enhanced_df = enhance_dataframe_with_analysis(output_df, [bot_analysis_results[interaction_id] for interaction_id in bot_row_ids])
+    enhanced_df = enhance_dataframe_with_student_analysis(enhanced_df, student_analysis_results)
+
+    # Save results to CSV
+    print(f"\n=== Saving Results ===")
+    os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+    if incremental and os.path.exists(output_file_path):
+        enhanced_df.to_csv(output_file_path, mode='a', header=False, index=False)
+        print(f"Appended {len(enhanced_df)} new rows to {output_file_path}")
+    else:
+        enhanced_df.to_csv(output_file_path, index=False)
+        print(f"Enhanced data saved to {output_file_path}")
+
+    if incremental:
+        save_watermarks(watermark_path, new_watermarks)
+        print(f"Watermarks saved to {watermark_path}")
+
+    # Summary
+    llm_calls = len(paired_interactions) + unpaired_bot_count
+    separate_calls = len(paired_interactions) + len(bot_row_ids)
+    print(f"\n=== Summary ===")
+    print(f"Total paired interactions: {len(paired_interactions)}")
+    print(f"Bot interactions labeled: {len(bot_row_ids)}")
+    print(f"LLM calls: {llm_calls} (separate bot and student prompts would need {separate_calls})")
+
+    execution_time = time.time() - start_time
+    print(f"\n Processing completed successfully!")
+    print(f"\n Total execution time: {execution_time:.2f} seconds ({execution_time/60:.2f} minutes)")
+    return enhanced_df
+
+
+if __name__ == "__main__":
+    # Label all users' bot and student responses with one call per paired turn
+    from model_registry import ModelSelector
+    from llm_utils import enable_hedging
+
+    # Define the model
+    model = ModelSelector()
+
+    input_file = "Input/Chronicles_sequential_interactions.csv"
+    output_file = "Output/Chronicles_combined_labels.csv"
+    incremental = False  # set to True to only label interactions added since the last run
+    hedging = False  # set to True to send a duplicate request for calls slower than the observed p95
+    dry_run = False  # set to True to label a sample and project time, calls and cost for the full file
+
+    if hedging:
+        hedger = enable_hedging(hedge_budget=0.05)
+
+    enhanced_df = process_all_users_combined_analysis(input_file, model, output_file, incremental=incremental, dry_run=dry_run)
+    if hedging:
+        hedger.report()
@@ -0,0 +1,235 @@
+"""
+Dry-run planning for the Socratic GenAI Bot project.
+This module labels a stratified sample of users for real, measures per-call latency and
+tokens, and projects wall time, call count and cost for the full input file.
+"""
+
+import math
+import threading
+import time
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Any
+from llm_utils import add_call_listener, remove_call_listener, get_hedger
+from llm_scheduler import get_scheduler
+from model_registry import model_prices
+
+
+def estimate_tokens(text) -> int:
+    """Rough token count for text (about four characters per token)."""
+    return math.ceil(len(text) / 4) if isinstance(text, str) else 0
+
+
+def response_token_usage(prompt: str, llm_response) -> tuple:
+    """
+    Input and output token counts for a call, taken from the response's usage data when
+    the API reports it and estimated from the text otherwise.
+
+    Returns:
+        tuple: (input_tokens, output_tokens)
+    """
+    if not isinstance(llm_response, dict):
+        return estimate_tokens(prompt), 0
+
+    usage = llm_response.get('usage') or (llm_response.get('metadata') or {}).get('usage') or {}
+    input_tokens = usage.get('input_tokens', usage.get('prompt_tokens'))
+    output_tokens = usage.get('output_tokens', usage.get('completion_tokens'))
+    if input_tokens is None:
+        input_tokens = estimate_tokens(prompt)
+    if output_tokens is None:
+        output_tokens = estimate_tokens(llm_response.get('response'))
+    return int(input_tokens), int(output_tokens)
+
+
+class CallStats:
+    """
+    Collects latency and token counts of LLM calls; register it with add_call_listener.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.input_tokens = []
+        self.output_tokens = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, interaction_type, prompt, llm_response, seconds):
+        input_tokens, output_tokens = response_token_usage(prompt, llm_response)
+        with self._lock:
+            self.latencies.append(seconds)
+            self.input_tokens.append(input_tokens)
+            self.output_tokens.append(output_tokens)
+            if llm_response is None:
+                self.errors += 1
+
+    def __len__(self):
+        return len(self.latencies)
+
+
+def stratified_user_sample(df: pd.DataFrame, sample_fraction: float = 0.05, strata: int = 4, seed: int = 42) -> List[Any]:
+    """
+    Sample users stratified by how many interactions they have, so short and long
+    conversations are both represented.
+
+    Args:
+        df: DataFrame containing all interactions
+        sample_fraction: Fraction of users to sample from each stratum
+        strata: Number of interaction-count quantile bins
+        seed: Random seed for reproducible samples
+
+    Returns:
+        List of sampled Asurite values (at least one per stratum)
+    """
+    counts = df.groupby('Asurite').size()
+    if len(counts) == 0:
+        return []
+
+    n_strata = min(strata, len(counts))
+    bins = pd.qcut(counts.rank(method='first'), q=n_strata, labels=False) if n_strata > 1 else pd.Series(0, index=counts.index)
+
+    sampled = []
+    for _, stratum in counts.groupby(bins):
+        n = max(1, int(round(len(stratum) * sample_fraction)))
+        sampled.extend(stratum.sample(n=n, random_state=seed).index)
+    return sampled
+
+
+def count_llm_calls(df: pd.DataFrame, pipeline: str) -> int:
+    """
+    Number of LLM calls a full run of a pipeline makes, computed without pairing.
+
+    Args:
+        df: DataFrame containing all interactions
+        pipeline: "bot", "student" or "combined"
+
+    Returns:
+        Number of LLM calls
+    """
+    if 'Interaction Type' not in df.columns:
+        # Old format: every row is a bot response (the 'Bot Response' column)
+        if pipeline != 'bot':
+            raise ValueError(f"The {pipeline} pipeline needs the new input format "
+                             f"(Asurite, Interaction ID, Interaction Type and Text columns)")
+        return len(df)
+
+    is_bot = df['Interaction Type'] == 'Bot Response'
+    if pipeline in ('bot', 'combined'):
+        # Combined runs make one call per pair plus one per unpaired bot response
+        return int(is_bot.sum())
+
+    is_student = df['Interaction Type'] == 'Student Query'
+    bots = is_bot.groupby(df['Asurite']).sum()
+    students = is_student.groupby(df['Asurite']).sum()
+    # Mirrors pair_bot_student_interactions: drop the first student query and the last bot response
+    pairs = np.where((bots > 0) & (students > 1), np.minimum(bots - 1, students - 1), 0)
+    return int(pairs.sum())
+
+
+def run_dry_run(df: pd.DataFrame, label_sample: Callable[[pd.DataFrame], Any], pipeline: str,
+                sample_fraction: float = 0.05, concurrency: int = None, model=None,
+                price_per_1k_input_tokens: float = None, price_per_1k_output_tokens: float = None) -> Dict[str, Any]:
+    """
+    Label a stratified sample of users for real and project the cost of the full run.
+
+    Args:
+        df: DataFrame containing all interactions
+        label_sample: Callable that runs the pipeline's LLM labeling on a sample DataFrame
+        pipeline: "bot", "student" or "combined"
+        sample_fraction: Fraction of users to sample from each stratum
+        concurrency: Number of concurrent LLM calls planned for the full run
+            (defaults to the shared scheduler's worker count)
+        model: The model configuration or ModelSelector used for the sample; its prices
+            are looked up in model_registry.MODEL_PRICES
+        price_per_1k_input_tokens: Price per 1,000 input tokens (overrides MODEL_PRICES)
+        price_per_1k_output_tokens: Price per 1,000 output tokens (overrides MODEL_PRICES)
+
+    Returns:
+        Dictionary with the sample measurements and the full-run projection
+    """
+    concurrency = concurrency or get_scheduler().max_workers
+    print(f"\n=== Dry Run ({pipeline}) ===")
+
+    full_calls = count_llm_calls(df, pipeline)
+    if 'Asurite' in df.columns:
+        sampled_users = stratified_user_sample(df, sample_fraction)
+        sample_df = df[df['Asurite'].isin(sampled_users)]
+        print(f"Sampled {len(sampled_users)}/{df['Asurite'].nunique()} users ({len(sample_df)}/{len(df)} rows)")
+    else:
+        # Old format has no user column, so sample rows instead
+        sampled_users = []
+        sample_df = df.sample(n=min(len(df), max(1, int(round(len(df) * sample_fraction)))), random_state=42)
+        print(f"Sampled {len(sample_df)}/{len(df)} rows (old input format, no Asurite column)")
+
+    # Hedged requests bypass the call listener, so count them on the hedger
+    hedger = get_hedger()
+    hedges_before = hedger.hedges if hedger is not None else 0
+    stats = CallStats()
+    add_call_listener(stats)
+    start = time.perf_counter()
+    try:
+        label_sample(sample_df)
+    finally:
+        remove_call_listener(stats)
+    sample_wall_time = time.perf_counter() - start
+    sample_hedges = hedger.hedges - hedges_before if hedger is not None else 0
+
+    sample_calls = len(stats)
+    if sample_calls == 0:
+        print("No LLM calls were made for the sample; nothing to extrapolate.")
+        return {'pipeline': pipeline, 'sample_calls': 0, 'projected_calls': full_calls}
+
+    mean_latency = float(np.mean(stats.latencies))
+    mean_input_tokens = float(np.mean(stats.input_tokens))
+    mean_output_tokens = float(np.mean(stats.output_tokens))
+    # A hedge is a full duplicate call; the full run can spend up to the hedge budget on them
+    # (the sample is usually too small to reach the hedger's min_samples, so its count is not used)
+    projected_hedges = int(full_calls * hedger.hedge_budget) if hedger is not None else 0
+    projected_input_tokens = mean_input_tokens * (full_calls + projected_hedges)
+    projected_output_tokens = mean_output_tokens * (full_calls + projected_hedges)
+    # Prices are looked up after the sample so a ModelSelector has made its choice
+    prices = model_prices(model) if model is not None else None
+    if price_per_1k_input_tokens is None and prices is not None:
+        price_per_1k_input_tokens = prices[0]
+    if price_per_1k_output_tokens is None and prices is not None:
+        price_per_1k_output_tokens = prices[1]
+    projected_cost = None
+    if price_per_1k_input_tokens is not None and price_per_1k_output_tokens is not None:
+        projected_cost = (projected_input_tokens * price_per_1k_input_tokens
+                          + projected_output_tokens * price_per_1k_output_tokens) / 1000
+    projected_wall_time = full_calls * mean_latency / concurrency
+
+    projection = {
+        'pipeline': pipeline,
+        'sampled_users': len(sampled_users),
+        'sample_calls': sample_calls,
+        'sample_errors': stats.errors,
+        'sample_hedges': sample_hedges,
+        'sample_wall_time': sample_wall_time,
+        'mean_latency': mean_latency,
+        'p95_latency': float(np.percentile(stats.latencies, 95)),
+        'mean_input_tokens': mean_input_tokens,
+        'mean_output_tokens': mean_output_tokens,
+        'concurrency': concurrency,
+        'projected_calls': full_calls,
+        'projected_hedges': projected_hedges,
+        'projected_wall_time': projected_wall_time,
+        'projected_input_tokens': projected_input_tokens,
+        'projected_output_tokens': projected_output_tokens,
+        'projected_cost': projected_cost
+    }
+
+    print(f"\nSample: {sample_calls} calls ({stats.errors} errors, {sample_hedges} hedges) in {sample_wall_time:.2f}s")
+    print(f"- Latency per call: mean {mean_latency:.2f}s, p95 {projection['p95_latency']:.2f}s")
+    print(f"- Tokens per call: {mean_input_tokens:.0f} in / {mean_output_tokens:.0f} out")
+    print(f"\nProjected full run:")
+    if hedger is not None:
+        print(f"- LLM calls: {full_calls} plus up to {projected_hedges} hedges ({hedger.hedge_budget:.0%} hedge budget)")
+    else:
+        print(f"- LLM calls: {full_calls}")
+    print(f"- Wall time at concurrency {concurrency}: {projected_wall_time:.0f}s ({projected_wall_time/3600:.2f} hours)")
+    print(f"- Tokens: {projected_input_tokens:,.0f} in / {projected_output_tokens:,.0f} out")
+    if projected_cost is not None:
+        print(f"- Cost: {projected_cost:.2f} USD")
+    else:
+        print(f"- Cost: unknown (no price for this model in model_registry.MODEL_PRICES)")
+    return projection
@@ -1,5 +1,6 @@
 import pandas as pd
 import json
+import os
 from typing import List, Dict, Any
 
 
@@ -34,6 +35,111 @@ def process_input_with_all_columns(filePath: str) -> pd.DataFrame:
     return df
 
 
+def interaction_sort_key(interaction_ids: pd.Series) -> pd.Series:
+    """
+    Extract the numeric suffix of each Interaction ID for chronological sorting.
+    
+    Args:
+        interaction_ids: Series of Interaction ID strings
+    
+    Returns:
+        Series of integers aligned with the input index
+    """
+    return interaction_ids.astype(str).str.extract(r'(\d+)$')[0].astype(int)
+
+
+def load_watermarks(watermark_path: str) -> Dict[str, int]:
+    """
+    Load the per-user watermarks written by a previous incremental run.
+    
+    Args:
+        watermark_path: Path to the watermark JSON file
+    
+    Returns:
+        Dictionary mapping Asurite to the highest numeric Interaction ID already processed
+        (empty if no previous run exists)
+    """
+    if not os.path.exists(watermark_path):
+        return {}
+    with open(watermark_path, 'r') as f:
+        return {str(user_id): int(mark) for user_id, mark in json.load(f).items()}
+
+
+def save_watermarks(watermark_path: str, watermarks: Dict[str, int]) -> None:
+    """
+    Save per-user watermarks so the next incremental run can skip processed interactions.
+    
+    Args:
+        watermark_path: Path to the watermark JSON file
+        watermarks: Dictionary mapping Asurite to the highest numeric Interaction ID processed
+    """
+    directory = os.path.dirname(watermark_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(watermark_path, 'w') as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+
+
+def select_new_interactions(df: pd.DataFrame, watermarks: Dict[str, int], upto: Dict[str, int] = None) -> pd.DataFrame:
+    """
+    Return only the rows that come after each user's watermark.
+    Users without a watermark are treated as entirely new.
+    
+    Args:
+        df: DataFrame containing all interactions
+        watermarks: Dictionary mapping Asurite to the highest numeric Interaction ID processed
+        upto: Optional dictionary of new watermarks; if given, only rows up to and including
+            each user's new watermark are returned (users missing from it get no rows)
+    
+    Returns:
+        DataFrame with the unprocessed rows, original index preserved
+    """
+    missing_columns = [col for col in ('Asurite', 'Interaction ID') if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Incremental mode needs the 'Asurite' and 'Interaction ID' columns "
+                         f"(new input format); missing: {missing_columns}")
+    
+    sort_key = interaction_sort_key(df['Interaction ID'])
+    users = df['Asurite'].astype(str)
+    selected = sort_key > users.map(watermarks).fillna(-1)
+    if upto is not None:
+        selected &= sort_key <= users.map(upto)
+    return df[selected]
+
+
+def update_watermarks(df: pd.DataFrame, watermarks: Dict[str, int]) -> Dict[str, int]:
+    """
+    Advance each user's watermark to the highest numeric Interaction ID in the DataFrame.
+    
+    Args:
+        df: DataFrame containing the interactions that were just processed
+        watermarks: Existing watermarks (not modified)
+    
+    Returns:
+        New dictionary of watermarks
+    """
+    updated = dict(watermarks)
+    if len(df) == 0:
+        return updated
+    latest = interaction_sort_key(df['Interaction ID']).groupby(df['Asurite'].astype(str)).max()
+    for user_id, mark in latest.items():
+        updated[user_id] = max(int(mark), updated.get(user_id, -1))
+    return updated
+
+
+def default_watermark_path(output_path: str) -> str:
+    """
+    Derive the watermark file location from an output file path.
+    
+    Args:
+        output_path: Path of the labeled output file
+    
+    Returns:
+        Path of the companion watermark JSON file
+    """
+    return os.path.splitext(output_path)[0] + "_watermarks.json"
+
+
 def enhance_dataframe_with_analysis(df: pd.DataFrame, analysis_results: List[Dict[str, Any]]) -> pd.DataFrame:
     """
     Enhance the original DataFrame with analysis results from prompt_builder.
@@ -88,18 +194,34 @@ def enhance_dataframe_with_analysis(df: pd.DataFrame, analysis_results: List[Dic
     return enhanced_df
 
 
-def save_enhanced_dataframe(df: pd.DataFrame, output_path: str) -> None:
+def save_enhanced_dataframe(df: pd.DataFrame, output_path: str, append: bool = False) -> None:
     """
-    Save the enhanced DataFrame to an Excel file.
+    Save the enhanced DataFrame to an Excel file (or a CSV file if the path ends in .csv).
+    
+    Appending to a CSV file only writes the new rows. Excel files cannot be appended to
+    without rewriting the whole history, so appending requires a .csv path.
     
     Args:
         df: Enhanced DataFrame to save
-        output_path: Path where to save the Excel file
+        output_path: Path where to save the Excel or CSV file
+        append: If True, add the rows after those already in an existing .csv output file
     """
+    if append and not output_path.endswith('.csv'):
+        raise ValueError(f"Appending needs a .csv output path (got {output_path}); "
+                         f"Excel files would be rewritten on every incremental run")
+    
     # Create output directory if it doesn't exist
-    import os
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
+    if output_path.endswith('.csv'):
+        if append and os.path.exists(output_path):
+            df.to_csv(output_path, mode='a', header=False, index=False)
+            print(f"Appended {len(df)} new rows to {output_path}")
+        else:
+            df.to_csv(output_path, index=False)
+            print(f"Enhanced data saved to {output_path}")
+        return
+    
     # Save to Excel
     df.to_excel(output_path, index=False)
     print(f"Enhanced data saved to {output_path}")
@@ -0,0 +1,245 @@
+"""
+Label analytics for the Socratic GenAI Bot project.
+This module summarizes the labeled bot and student outputs with vectorized pandas
+operations and writes the results as tables, separately from the labeling runs.
+"""
+
+import os
+import time
+import pandas as pd
+from typing import Dict
+from input_processing import interaction_sort_key
+
+
+BOT_COLUMNS = ['socratic_label', 'confidence']
+STUDENT_COLUMNS = ['labels', 'label_count']
+KEY_COLUMNS = ['Asurite', 'Interaction ID']
+
+
+def read_labeled_output(file_path: str) -> pd.DataFrame:
+    """
+    Read a labeled output file written by one of the processors.
+
+    Args:
+        file_path: Path to a .csv or .xlsx output file
+
+    Returns:
+        DataFrame with all columns from the output file
+    """
+    if file_path.endswith('.xlsx'):
+        return pd.read_excel(file_path)
+    return pd.read_csv(file_path)
+
+
+def combine_labeled_outputs(bot_df: pd.DataFrame = None, student_df: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Combine the bot and student outputs into one DataFrame keyed by user and Interaction ID.
+    Either output may be missing, in which case its label columns are left empty.
+
+    Args:
+        bot_df: Output of the bot response processor
+        student_df: Output of the student response processor
+
+    Returns:
+        DataFrame with the original columns plus bot and student label columns
+    """
+    if bot_df is None and student_df is None:
+        raise ValueError("At least one labeled output is required")
+
+    if student_df is None:
+        combined = bot_df.copy()
+    elif bot_df is None:
+        combined = student_df.copy()
+    else:
+        bot_labels = bot_df[KEY_COLUMNS + [col for col in BOT_COLUMNS if col in bot_df.columns]]
+        combined = student_df.drop(columns=[col for col in BOT_COLUMNS if col in student_df.columns])
+        combined = combined.merge(bot_labels, on=KEY_COLUMNS, how='left')
+
+    for col in BOT_COLUMNS + STUDENT_COLUMNS:
+        if col not in combined.columns:
+            combined[col] = 0 if col in ('confidence', 'label_count') else ''
+
+    combined['socratic_label'] = combined['socratic_label'].fillna('').astype(str)
+    combined['labels'] = combined['labels'].fillna('').astype(str)
+    combined['label_count'] = combined['label_count'].fillna(0).astype(int)
+    return combined
+
+
+def explode_student_labels(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Split the '; '-joined student labels into one row per assigned label.
+
+    Args:
+        df: Combined DataFrame with a 'labels' column
+
+    Returns:
+        DataFrame of student rows with one 'label' value per row (with a fresh index,
+        since a multi-label row would otherwise repeat its index label)
+    """
+    students = df[df['Interaction Type'] == 'Student Query']
+    exploded = students.assign(label=students['labels'].str.split(';')).explode('label').reset_index(drop=True)
+    exploded['label'] = exploded['label'].str.strip()
+    return exploded[(exploded['label'] != '') & (exploded['label'] != 'No labels assigned')]
+
+
+def student_label_distribution(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Count how often each student engagement label was assigned.
+
+    Args:
+        df: Combined DataFrame with a 'labels' column
+
+    Returns:
+        DataFrame with label, count and share columns, most common first
+    """
+    counts = explode_student_labels(df)['label'].value_counts()
+    return pd.DataFrame({
+        'label': counts.index,
+        'count': counts.values,
+        'share': counts.values / max(counts.sum(), 1)
+    })
+
+
+def bot_label_distribution(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Count how often each Socratic label was assigned to bot responses.
+
+    Args:
+        df: Combined DataFrame with a 'socratic_label' column
+
+    Returns:
+        DataFrame with socratic_label, count and share columns, most common first
+    """
+    bots = df[(df['Interaction Type'] == 'Bot Response') & (df['socratic_label'] != '')]
+    counts = bots['socratic_label'].value_counts()
+    return pd.DataFrame({
+        'socratic_label': counts.index,
+        'count': counts.values,
+        'share': counts.values / max(counts.sum(), 1)
+    })
+
+
+def per_user_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute per-user labeling statistics with a single groupby per interaction type.
+
+    Args:
+        df: Combined DataFrame
+
+    Returns:
+        DataFrame indexed by Asurite with student and bot label counts
+        (bot counts only when the DataFrame has a 'socratic_label' column)
+    """
+    students = df[df['Interaction Type'] == 'Student Query']
+    bots = df[df['Interaction Type'] == 'Bot Response']
+
+    student_stats = students.assign(has_labels=students['label_count'] > 0).groupby('Asurite').agg(
+        student_queries=('label_count', 'size'),
+        students_with_labels=('has_labels', 'sum'),
+        avg_labels=('label_count', 'mean')
+    )
+    if 'socratic_label' not in df.columns:
+        return student_stats
+
+    bot_stats = bots.assign(has_label=bots['socratic_label'] != '').groupby('Asurite').agg(
+        bot_responses=('socratic_label', 'size'),
+        bots_with_label=('has_label', 'sum')
+    )
+
+    stats = student_stats.join(bot_stats, how='outer').fillna(0)
+    count_columns = ['student_queries', 'students_with_labels', 'bot_responses', 'bots_with_label']
+    stats[count_columns] = stats[count_columns].astype(int)
+    return stats
+
+
+def bot_student_crosstab(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cross-tabulate each bot turn's Socratic label against the labels of the student reply.
+    Each student query is matched to the bot response immediately preceding it for the
+    same user, which is how pair_bot_student_interactions pairs alternating turns.
+
+    Args:
+        df: Combined DataFrame
+
+    Returns:
+        DataFrame with bot socratic labels as rows and student labels as columns
+    """
+    ordered = df.assign(sort_key=interaction_sort_key(df['Interaction ID'])).sort_values(['Asurite', 'sort_key'])
+    bot_label = ordered['socratic_label'].where(ordered['Interaction Type'] == 'Bot Response')
+    ordered['bot_label'] = bot_label.groupby(ordered['Asurite']).ffill()
+
+    exploded = explode_student_labels(ordered)
+    exploded = exploded[exploded['bot_label'].notna() & (exploded['bot_label'] != '')]
+    return pd.crosstab(exploded['bot_label'], exploded['label'])
+
+
+def compute_label_analytics(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Compute all analytics tables for a combined output.
+
+    Args:
+        df: Combined DataFrame
+
+    Returns:
+        Dictionary mapping table names to DataFrames
+    """
+    return {
+        'student_label_distribution': student_label_distribution(df),
+        'bot_label_distribution': bot_label_distribution(df),
+        'per_user_stats': per_user_stats(df),
+        'bot_student_crosstab': bot_student_crosstab(df)
+    }
+
+
+def save_analytics_tables(tables: Dict[str, pd.DataFrame], output_dir: str) -> None:
+    """
+    Save each analytics table as a CSV file.
+
+    Args:
+        tables: Dictionary mapping table names to DataFrames
+        output_dir: Directory where to save the CSV files
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for name, table in tables.items():
+        keep_index = name in ('per_user_stats', 'bot_student_crosstab')
+        table.to_csv(os.path.join(output_dir, f"{name}.csv"), index=keep_index)
+        print(f"Saved {name} ({len(table)} rows) to {output_dir}")
+
+
+def run_label_analytics(bot_output_path: str = None, student_output_path: str = None,
+                        output_dir: str = "Output/analytics") -> Dict[str, pd.DataFrame]:
+    """
+    Read the labeled outputs, compute the analytics tables and save them.
+
+    Args:
+        bot_output_path: Path to the bot processor output (optional)
+        student_output_path: Path to the student processor output (optional)
+        output_dir: Directory where to save the analytics tables
+
+    Returns:
+        Dictionary mapping table names to DataFrames
+    """
+    start_time = time.time()
+    print("=== Label Analytics Started ===")
+
+    bot_df = read_labeled_output(bot_output_path) if bot_output_path and os.path.exists(bot_output_path) else None
+    student_df = read_labeled_output(student_output_path) if student_output_path and os.path.exists(student_output_path) else None
+    combined_df = combine_labeled_outputs(bot_df, student_df)
+    print(f"Combined output has {len(combined_df)} rows")
+
+    tables = compute_label_analytics(combined_df)
+    save_analytics_tables(tables, output_dir)
+
+    execution_time = time.time() - start_time
+    print(f"\n⏱️  Total execution time: {execution_time:.2f} seconds")
+    return tables
+
+
+if __name__ == "__main__":
+    bot_output = "Output/Chronicles_bot_labels.xlsx"
+    student_output = "Output/Chronicles_student_labels.csv"
+    output_dir = "Output/analytics"  # change the analytics output folder here
+
+    tables = run_label_analytics(bot_output, student_output, output_dir)
+    print(f"\nMost Common Student Labels:")
+    print(tables['student_label_distribution'].head(10).to_string(index=False))
@@ -0,0 +1,277 @@
+"""
+LLM job scheduling for the Socratic GenAI Bot project.
+This module runs process_llm_response calls concurrently, dispatching the longest
+(most expensive) prompts first so a few long turns do not stretch the end of a run.
+"""
+
+import heapq
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Dict, Any
+from llm_utils import process_llm_response
+
+
+DEFAULT_MAX_WORKERS = 4
+LATENCY_MODEL_PATH = "Output/llm_latency_model.json"
+
+# Lower values are dispatched first. The queue lives in one Python process, so an
+# interactive batch only jumps ahead of bulk batches submitted from the same process;
+# separate scripts (e.g. the first-user test script) each have their own scheduler.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+
+class LatencyModel:
+    """
+    Estimates how long an LLM call will take from its request size.
+    Learns seconds-per-character for each interaction type and power-of-two size bucket
+    from past calls. With a path, the rates are loaded from and saved to a JSON file so
+    a batch is ordered by what earlier runs observed.
+    """
+
+    def __init__(self, default_seconds_per_char: float = 0.001, smoothing: float = 0.3, path: str = None):
+        self.default_seconds_per_char = default_seconds_per_char
+        self.smoothing = smoothing
+        self.path = path
+        self._seconds_per_char = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                self._seconds_per_char = {key: float(rate) for key, rate in json.load(f).items()}
+
+    @staticmethod
+    def _key(interaction_type: str, size: int) -> str:
+        return f"{interaction_type}:{int(math.log2(max(size, 1)))}"
+
+    def estimate(self, interaction_type: str, size: int) -> float:
+        """Estimated duration in seconds for a call of the given type and size."""
+        with self._lock:
+            rate = self._seconds_per_char.get(self._key(interaction_type, size))
+            if rate is None:
+                # Fall back to the average over the sizes seen so far for this type
+                same_type = [value for key, value in self._seconds_per_char.items()
+                             if key.startswith(f"{interaction_type}:")]
+                rate = sum(same_type) / len(same_type) if same_type else None
+        return (rate if rate is not None else self.default_seconds_per_char) * max(size, 1)
+
+    def observe(self, interaction_type: str, size: int, seconds: float) -> None:
+        """Record the observed duration of a call (exponential moving average per bucket)."""
+        rate = seconds / max(size, 1)
+        key = self._key(interaction_type, size)
+        with self._lock:
+            previous = self._seconds_per_char.get(key)
+            if previous is None:
+                self._seconds_per_char[key] = rate
+            else:
+                self._seconds_per_char[key] = (1 - self.smoothing) * previous + self.smoothing * rate
+
+    def save(self) -> None:
+        """Write the learned rates to the model's path (does nothing without a path)."""
+        if not self.path:
+            return
+        with self._lock:
+            rates = dict(self._seconds_per_char)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(rates, f, indent=2, sort_keys=True)
+
+
+class LLMRequest:
+    """
+    One process_llm_response call.
+
+    prompt and interaction_text may be strings or zero-argument callables. Callables are
+    only invoked by the worker that runs the call (interaction_text only if the call
+    fails), so a queued batch holds references to existing records rather than every
+    built prompt. size orders the queue; it defaults to the length of prompt, or of
+    interaction_text when the prompt is built lazily.
+    """
+
+    __slots__ = ('prompt', 'interaction_type', 'interaction_id', 'interaction_text', 'size')
+
+    def __init__(self, prompt, interaction_type, interaction_id, interaction_text, size: int = None):
+        self.prompt = prompt
+        self.interaction_type = interaction_type
+        self.interaction_id = interaction_id
+        self.interaction_text = interaction_text
+        if size is None:
+            text = prompt if isinstance(prompt, str) else interaction_text
+            size = len(text) if isinstance(text, str) else 0
+        self.size = size
+
+
+class LLMJob:
+    """A single LLMRequest waiting in the scheduler queue."""
+
+    __slots__ = ('model', 'request', 'priority', 'estimated_cost', 'duration', 'future')
+
+    def __init__(self, model, request, priority, estimated_cost):
+        self.model = model
+        self.request = request
+        self.priority = priority
+        self.estimated_cost = estimated_cost
+        self.duration = 0.0
+        self.future = Future()
+
+
+def simulate_makespan(durations: List[float], max_workers: int) -> float:
+    """
+    Wall time a list of jobs would take if dispatched in the given order to max_workers
+    workers, each taking the next job as soon as it is free.
+
+    Args:
+        durations: Job durations in dispatch order
+        max_workers: Number of concurrent workers
+
+    Returns:
+        Simulated total wall time in seconds
+    """
+    workers = [0.0] * max(min(max_workers, len(durations)), 1)
+    for duration in durations:
+        heapq.heapreplace(workers, workers[0] + duration)
+    return max(workers)
+
+
+class LLMScheduler:
+    """
+    Priority queue of LLM jobs served by a pool of worker threads.
+    Jobs are ordered by priority first, then by estimated cost (longest first).
+    Priorities only compete between jobs submitted to the same scheduler instance.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, latency_model: LatencyModel = None):
+        self.max_workers = max_workers
+        self.latency_model = latency_model or LatencyModel()
+        self.last_report = None
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._workers = []
+        self._shutdown = False
+
+    def submit(self, model, prompt, interaction_type, interaction_id, interaction_text, priority: int = PRIORITY_BULK) -> Future:
+        """
+        Queue one process_llm_response call.
+
+        Returns:
+            Future resolving to the parsed response (or error placeholder)
+        """
+        request = LLMRequest(prompt, interaction_type, interaction_id, interaction_text)
+        return self._submit_jobs(model, [request], priority)[0].future
+
+    def _submit_jobs(self, model, requests: List[LLMRequest], priority) -> List[LLMJob]:
+        jobs = [LLMJob(model, request, priority, self.latency_model.estimate(request.interaction_type, request.size))
+                for request in requests]
+        # Queue the whole batch before any worker wakes up, so the first jobs taken
+        # are the most expensive of the batch rather than the first in input order
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Scheduler has been shut down")
+            for job in jobs:
+                heapq.heappush(self._queue, (priority, -job.estimated_cost, next(self._sequence), job))
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._worker_loop, daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            self._condition.notify_all()
+        return jobs
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue and not self._shutdown:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                job = heapq.heappop(self._queue)[-1]
+
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            request = job.request
+            start = time.perf_counter()
+            try:
+                prompt = request.prompt() if callable(request.prompt) else request.prompt
+                result = process_llm_response(job.model, prompt, request.interaction_type,
+                                              request.interaction_id, request.interaction_text)
+            except Exception as e:
+                job.future.set_exception(e)
+                continue
+            job.duration = time.perf_counter() - start
+            self.latency_model.observe(request.interaction_type, request.size, job.duration)
+            job.future.set_result(result)
+
+    def run_batch(self, model, requests: List[LLMRequest], priority: int = PRIORITY_BULK) -> List[Dict[str, Any]]:
+        """
+        Run a batch of LLM calls and wait for all of them.
+        Prints the wall time against a FIFO baseline simulated from the observed durations,
+        and saves the latency model so the next run's batches are ordered by these durations.
+
+        Args:
+            model: The LLM model configuration
+            requests: List of LLMRequest
+            priority: Queue priority for the whole batch
+
+        Returns:
+            List of parsed responses in the same order as requests
+        """
+        if not requests:
+            return []
+
+        start = time.perf_counter()
+        jobs = self._submit_jobs(model, requests, priority)
+        results = [job.future.result() for job in jobs]
+        wall_time = time.perf_counter() - start
+        self.latency_model.save()
+
+        durations = [job.duration for job in jobs]
+        fifo_time = simulate_makespan(durations, self.max_workers)
+        self.last_report = {
+            'jobs': len(jobs),
+            'workers': self.max_workers,
+            'wall_time': wall_time,
+            'fifo_baseline': fifo_time,
+            'total_call_time': sum(durations)
+        }
+        print(f"⏱️  {len(jobs)} LLM calls on {self.max_workers} workers: {wall_time:.2f}s wall time "
+              f"(FIFO order baseline: {fifo_time:.2f}s, sequential: {sum(durations):.2f}s)")
+        return results
+
+    def shutdown(self) -> None:
+        """Stop the workers once the queued jobs are done."""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(max_workers: int = DEFAULT_MAX_WORKERS) -> LLMScheduler:
+    """
+    Return the scheduler shared by all callers in this Python process, so interactive and
+    bulk batches submitted from the same process share one queue. It is not shared with
+    other processes; its latency model is loaded from and saved to LATENCY_MODEL_PATH.
+
+    Args:
+        max_workers: Number of workers used when the scheduler is first created
+
+    Returns:
+        The shared LLMScheduler
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = LLMScheduler(max_workers=max_workers,
+                                              latency_model=LatencyModel(path=LATENCY_MODEL_PATH))
+        return _default_scheduler
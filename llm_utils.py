@@ -4,18 +4,242 @@ This module contains helper functions for processing LLM responses with error ha
 """
 
 import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from model_registry import ModelSelector
+
+
+class LatencyTracker:
+    """
+    Rolling window of observed LLM call latencies with percentile lookups.
+    """
+    
+    def __init__(self, window=1000):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+    
+    def __len__(self):
+        return len(self._latencies)
+    
+    def percentile(self, p):
+        """Return the p-th percentile (0-100) of the recorded latencies, or None if empty."""
+        with self._lock:
+            ordered = sorted(self._latencies)
+        if not ordered:
+            return None
+        index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+
+class HedgedQuery:
+    """
+    Sends a duplicate LLM request when the first one is slower than the observed p95
+    latency, and returns whichever answer arrives first.
+    
+    The slower request is cancelled if it has not started yet; a request that is already
+    running cannot be interrupted, so its daemon thread finishes in the background (still
+    holding one of the max_workers slots) and its answer is discarded. Hedges are capped at hedge_budget * calls so the extra cost
+    stays bounded (e.g. 0.05 allows at most 5% extra calls).
+    """
+    
+    def __init__(self, hedge_budget=0.05, hedge_percentile=95, min_samples=20, max_workers=32):
+        self.hedge_budget = hedge_budget
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.primary_latencies = LatencyTracker()
+        self.effective_latencies = LatencyTracker()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_workers)
+    
+    def _submit(self, query_fn, kwargs):
+        """
+        Run query_fn on a daemon thread so an abandoned, hung request never blocks the
+        interpreter from exiting (ThreadPoolExecutor threads are joined at exit).
+        At most max_workers requests run at once; an abandoned request keeps its slot
+        until query_fn returns.
+        """
+        future = Future()
+        
+        def run():
+            with self._slots:
+                if not future.set_running_or_notify_cancel():
+                    return
+                try:
+                    future.set_result(query_fn(**kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+        
+        threading.Thread(target=run, daemon=True).start()
+        return future
+    
+    @staticmethod
+    def _answered(future):
+        """Whether a finished request returned a usable answer (same check as probe_model)."""
+        if future.exception() is not None:
+            return False
+        response = future.result()
+        return bool(response and response.get('response'))
+    
+    def _hedge_delay(self):
+        if len(self.primary_latencies) < self.min_samples:
+            return None
+        return self.primary_latencies.percentile(self.hedge_percentile)
+    
+    def _take_hedge(self):
+        with self._lock:
+            if self.hedges + 1 > self.hedge_budget * self.calls:
+                return False
+            self.hedges += 1
+            return True
+    
+    def __call__(self, query_fn, **kwargs):
+        """
+        Run query_fn(**kwargs), hedging it with a second identical call if it is slow.
+        
+        Args:
+            query_fn: The blocking LLM query function (e.g. ASUllmAPI.query_llm)
+            **kwargs: Arguments passed to query_fn
+        
+        Returns:
+            The first response with a non-empty answer (or the other request's response
+            if the first one to finish failed)
+        """
+        with self._lock:
+            self.calls += 1
+        start = time.perf_counter()
+        
+        primary = self._submit(query_fn, kwargs)
+        # Record the primary's latency even if the hedge wins, to track the unhedged tail
+        primary.add_done_callback(lambda _: self.primary_latencies.record(time.perf_counter() - start))
+        
+        delay = self._hedge_delay()
+        if delay is not None:
+            done, _ = wait([primary], timeout=delay)
+            if not done and self._take_hedge():
+                hedge = self._submit(query_fn, kwargs)
+                done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+                first = primary if primary in done else hedge
+                other = hedge if first is primary else primary
+                if not self._answered(first):
+                    # First answer failed (query_llm reports errors as an empty response
+                    # rather than raising); fall back to the other request
+                    winner = other
+                else:
+                    winner = first
+                    other.cancel()
+                if winner is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                response = winner.result()
+                self.effective_latencies.record(time.perf_counter() - start)
+                return response
+        
+        response = primary.result()
+        self.effective_latencies.record(time.perf_counter() - start)
+        return response
+    
+    def metrics(self):
+        """
+        Return hedging metrics: call and hedge counts, and effective latency percentiles
+        next to the p99 of the primary requests alone (the unhedged tail).
+        """
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": self.hedges / self.calls if self.calls else 0.0,
+            "p50": self.effective_latencies.percentile(50),
+            "p95": self.effective_latencies.percentile(95),
+            "p99": self.effective_latencies.percentile(99),
+            "unhedged_p99": self.primary_latencies.percentile(99)
+        }
+    
+    def report(self):
+        """Print the hedging metrics."""
+        metrics = self.metrics()
+        if not metrics["calls"]:
+            return
+        print(f"Hedging: {metrics['hedges']}/{metrics['calls']} calls hedged ({metrics['hedge_rate']:.1%}), "
+              f"{metrics['hedge_wins']} won by the hedge")
+        seconds = lambda value: f"{value:.2f}s" if value is not None else "n/a"
+        print(f"Latency p50/p95/p99: {seconds(metrics['p50'])} / {seconds(metrics['p95'])} / {seconds(metrics['p99'])} "
+              f"(unhedged p99: {seconds(metrics['unhedged_p99'])})")
+
+
+_hedger = None
+
+
+def enable_hedging(hedge_budget=0.05, **kwargs):
+    """
+    Turn on hedged requests for every process_llm_response call in this process.
+    
+    Args:
+        hedge_budget: Maximum fraction of extra calls spent on hedges
+        **kwargs: Other HedgedQuery settings
+    
+    Returns:
+        HedgedQuery: The active hedger (use .metrics() or .report() at the end of a run)
+    """
+    global _hedger
+    _hedger = HedgedQuery(hedge_budget=hedge_budget, **kwargs)
+    return _hedger
+
+
+def disable_hedging():
+    """Turn off hedged requests."""
+    global _hedger
+    _hedger = None
+
+
+def get_hedger():
+    """Return the active HedgedQuery, or None when hedging is off."""
+    return _hedger
+
+
+_call_listeners = []
+
+
+def add_call_listener(listener):
+    """
+    Register a callable notified after every LLM call made by process_llm_response.
+    It is called as listener(interaction_type, prompt, llm_response, seconds), with
+    llm_response set to None when the call failed.
+    """
+    _call_listeners.append(listener)
+
+
+def remove_call_listener(listener):
+    """Unregister a listener added with add_call_listener."""
+    if listener in _call_listeners:
+        _call_listeners.remove(listener)
+
+
+def _notify_call_listeners(interaction_type, prompt, llm_response, seconds):
+    for listener in list(_call_listeners):
+        listener(interaction_type, prompt, llm_response, seconds)
 
 
 def process_llm_response(model, prompt, interaction_type, interaction_id, interaction_text, retry_count=3):
     """
     Helper method to process LLM responses with error handling.
+    Uses hedged requests when enable_hedging() has been called.
     
     Args:
-        model: The LLM model configuration
+        model: The LLM model configuration, or a ModelSelector
         prompt: The prompt to send to the LLM
-        interaction_type: "bot" or "student" for logging
+        interaction_type: "bot", "student" or "combined" for logging
         interaction_id: ID for tracking
-        interaction_text: The text being processed
+        interaction_text: The text being processed, or a callable returning it
+            (only called to build the error placeholder)
         retry_count: Number of retries for failed API calls
     
     Returns:
@@ -23,14 +247,32 @@ def process_llm_response(model, prompt, interaction_type, interaction_id, intera
     """
     from ASUllmAPI import query_llm
     
+    # A ModelSelector picks the current healthy model and is told about failures
+    selector = model if isinstance(model, ModelSelector) else None
+    
     try:
-        llm_response = query_llm(model=model,
-                                 query=prompt,
-                                 num_retry=retry_count,
-                                 success_sleep=0.0,
-                                 fail_sleep=1.0)
-
-        response_text = llm_response.get('response')
+        if selector is not None:
+            # Raises RuntimeError if no model is healthy; that becomes this call's placeholder
+            model = selector.current()
+        query_args = dict(model=model,
+                          query=prompt,
+                          num_retry=retry_count,
+                          success_sleep=0.0,
+                          fail_sleep=1.0)
+        hedger = _hedger
+        call_start = time.perf_counter()
+        try:
+            llm_response = hedger(query_llm, **query_args) if hedger is not None else query_llm(**query_args)
+            response_text = llm_response.get('response') if llm_response else None
+            if not response_text:
+                # Same condition probe_model treats as an unhealthy model
+                raise ValueError("LLM returned no response")
+        except Exception:
+            _notify_call_listeners(interaction_type, prompt, None, time.perf_counter() - call_start)
+            if selector is not None:
+                selector.report_failure(model)
+            raise
+        _notify_call_listeners(interaction_type, prompt, llm_response, time.perf_counter() - call_start)
         
         # Parse JSON response
         try:
@@ -47,6 +289,8 @@ def process_llm_response(model, prompt, interaction_type, interaction_id, intera
             else:
                 raise
 
+        if selector is not None:
+            selector.report_success(model)
         print(f"✓ Successfully processed {interaction_type} {interaction_id}")
         return parsed
         
@@ -54,22 +298,72 @@ def process_llm_response(model, prompt, interaction_type, interaction_id, intera
         print(f"✗ Error processing {interaction_type} {interaction_id}: {e}")
         
         # Return appropriate error placeholder based on interaction type
-        if interaction_type == "bot":
-            return {
-                "non_question_part": "",
-                "question_part": "",
-                "socratic_label": "Error",
-                "rationale": f"Processing error: {str(e)[:50]}",
-                "confidence": 0.0
-            }
-        else:  # student
-            return {
-                "bot_message": interaction_text,
-                "student_response": interaction_text,
-                "assigned_labels": [
-                    {
-                        "label": "Error",
-                        "reasoning": f"Processing error: {str(e)[:50]}"
-                    }
-                ]
+        if callable(interaction_text):
+            interaction_text = interaction_text()
+        return error_placeholder(interaction_type, interaction_text, e)
+
+
+def error_placeholder(interaction_type, interaction_text, error):
+    """
+    Build the placeholder result used when an LLM call or its parsing fails.
+    
+    Args:
+        interaction_type: "bot", "student" or "combined"
+        interaction_text: The text being processed
+        error: The exception that was raised
+    
+    Returns:
+        dict: Placeholder with the same keys as a successful response
+    """
+    bot_placeholder = {
+        "non_question_part": "",
+        "question_part": "",
+        "socratic_label": "Error",
+        "rationale": f"Processing error: {str(error)[:50]}",
+        "confidence": 0.0
+    }
+    student_placeholder = {
+        "bot_message": interaction_text,
+        "student_response": interaction_text,
+        "assigned_labels": [
+            {
+                "label": "Error",
+                "reasoning": f"Processing error: {str(error)[:50]}"
             }
+        ]
+    }
+    
+    if interaction_type == "bot":
+        return bot_placeholder
+    elif interaction_type == "combined":
+        return {**bot_placeholder, **student_placeholder}
+    else:  # student
+        return student_placeholder
+
+
+def split_combined_response(parsed, bot_text, student_text):
+    """
+    Split a combined bot+student response into separate bot and student results,
+    shaped like the outputs of the individual bot and student prompts.
+    
+    Args:
+        parsed: Parsed JSON from the combined classification prompt
+        bot_text: The bot message of the pair
+        student_text: The student response of the pair
+    
+    Returns:
+        tuple: (bot_result, student_result)
+    """
+    bot_result = {
+        "non_question_part": parsed.get("non_question_part", ""),
+        "question_part": parsed.get("question_part", ""),
+        "socratic_label": parsed.get("socratic_label", ""),
+        "rationale": parsed.get("rationale", ""),
+        "confidence": parsed.get("confidence", 0.0)
+    }
+    student_result = {
+        "bot_message": parsed.get("bot_message", bot_text),
+        "student_response": parsed.get("student_response", student_text),
+        "assigned_labels": parsed.get("assigned_labels", [])
+    }
+    return bot_result, student_result
@@ -0,0 +1,231 @@
+"""
+Model discovery and health checks for the Socratic GenAI Bot project.
+This module fetches the available models from the model list endpoint, probes candidate
+models with a tiny prompt, and selects (or fails over to) the fastest healthy model that
+is on the quality allowlist.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import List, Tuple, Optional
+
+
+# Models that meet the minimum labeling quality, as (name, provider) pairs
+QUALITY_ALLOWLIST = [
+    ("gpt4_1", "openai"),
+    ("llama3_2-90b", "aws"),
+]
+
+# Price per 1,000 (input, output) tokens in USD, keyed like QUALITY_ALLOWLIST.
+# These are the providers' public list prices; replace them with the gateway's rates if they differ.
+MODEL_PRICES = {
+    ("gpt4_1", "openai"): (0.002, 0.008),
+    ("llama3_2-90b", "aws"): (0.00072, 0.00072),
+}
+
+PROBE_PROMPT = "Reply with the single word OK."
+MODEL_LIST_CACHE_PATH = "Output/model_list_cache.json"
+
+
+def fetch_model_list(cache_path: str = MODEL_LIST_CACHE_PATH, cache_ttl: float = 3600.0) -> List[Tuple[str, str]]:
+    """
+    Fetch the available models with ASUllmAPI's model info API, reusing a cached copy
+    if it is recent enough. An empty list is not cached.
+
+    Args:
+        cache_path: Path to the JSON cache file
+        cache_ttl: Maximum age of the cache in seconds
+
+    Returns:
+        List of (name, provider) pairs (empty if the endpoint returned no models)
+    """
+    if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < cache_ttl:
+        with open(cache_path, 'r') as f:
+            models = [tuple(model) for model in json.load(f)]
+        if models:
+            return models
+
+    from ASUllmAPI import ModelConfig, query_model_info_api, model_provider_mapper
+    from config import TEST_LLMs_API_ACCESS_TOKEN, TEST_LLMs_REST_API_PROVIDERS_URL
+
+    model_info = query_model_info_api(ModelConfig(api_url=TEST_LLMs_REST_API_PROVIDERS_URL,
+                                                  access_token=TEST_LLMs_API_ACCESS_TOKEN),
+                                      success_sleep=0.0)
+    models = list(model_provider_mapper(model_info).items())
+    if not models:
+        return models
+
+    directory = os.path.dirname(cache_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(cache_path, 'w') as f:
+        json.dump(models, f)
+    return models
+
+
+def build_model_config(name: str, provider: str):
+    """
+    Build the ASUllmAPI model configuration for a model/provider pair.
+    """
+    from ASUllmAPI import ModelConfig
+    from config import TEST_LLMs_API_ACCESS_TOKEN, TEST_LLMs_REST_API_URL
+
+    return ModelConfig(name=name,
+                       provider=provider,
+                       access_token=TEST_LLMs_API_ACCESS_TOKEN,
+                       api_url=TEST_LLMs_REST_API_URL)
+
+
+def probe_model(name: str, provider: str) -> Optional[float]:
+    """
+    Send a tiny prompt to a model and measure how long it takes to answer.
+
+    Returns:
+        Latency in seconds, or None if the model did not answer
+    """
+    from ASUllmAPI import query_llm
+
+    start = time.perf_counter()
+    try:
+        response = query_llm(model=build_model_config(name, provider),
+                             query=PROBE_PROMPT,
+                             num_retry=1,
+                             success_sleep=0.0,
+                             fail_sleep=0.0)
+    except Exception as e:
+        print(f"✗ Probe failed for {name} ({provider}): {e}")
+        return None
+    if not response or not response.get('response'):
+        print(f"✗ Probe got no answer from {name} ({provider})")
+        return None
+    return time.perf_counter() - start
+
+
+def model_prices(model) -> Optional[Tuple[float, float]]:
+    """
+    Look up the token prices of a model configuration or of a ModelSelector's current choice.
+
+    Returns:
+        (input, output) price per 1,000 tokens, or None if the price is unknown
+    """
+    if isinstance(model, ModelSelector):
+        selected = model.selected
+    else:
+        selected = (getattr(model, 'name', None), getattr(model, 'provider', None))
+    return MODEL_PRICES.get(selected)
+
+
+class ModelSelector:
+    """
+    Picks the fastest healthy allowlisted model and fails over when it stops answering.
+    Can be passed anywhere a model configuration is expected by process_llm_response;
+    the choice is refreshed every refresh_interval seconds during long runs.
+    """
+
+    def __init__(self, allowlist: List[Tuple[str, str]] = None, refresh_interval: float = 1800.0,
+                 max_failures: int = 3, cache_path: str = MODEL_LIST_CACHE_PATH):
+        self.allowlist = allowlist or QUALITY_ALLOWLIST
+        self.refresh_interval = refresh_interval
+        self.max_failures = max_failures
+        self.cache_path = cache_path
+        self.latencies = {}
+        self._selected = None
+        self._config = None
+        self._failures = 0
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _candidates(self) -> List[Tuple[str, str]]:
+        try:
+            available = set(fetch_model_list(self.cache_path))
+        except Exception as e:
+            print(f"✗ Could not fetch model list, probing the allowlist directly: {e}")
+            return list(self.allowlist)
+        candidates = [model for model in self.allowlist if model in available]
+        if not candidates:
+            print(f"✗ Model list has no allowlisted model ({len(available)} listed), probing the allowlist directly")
+            return list(self.allowlist)
+        return candidates
+
+    def _select(self, exclude: Tuple[str, str] = None) -> bool:
+        healthy = {model: latency for model, latency in self.latencies.items()
+                   if latency is not None and model != exclude}
+        if not healthy:
+            return False
+        self._selected = min(healthy, key=healthy.get)
+        self._config = build_model_config(*self._selected)
+        self._failures = 0
+        print(f"Selected model {self._selected[0]} ({self._selected[1]}), probe latency {healthy[self._selected]:.2f}s")
+        return True
+
+    def _refresh(self) -> None:
+        # Probing can take seconds per model, so it runs without holding self._lock;
+        # callers hold self._refresh_lock so only one refresh probes at a time
+        latencies = {(name, provider): probe_model(name, provider)
+                     for name, provider in self._candidates()}
+        with self._lock:
+            self.latencies = latencies
+            self._refreshed_at = time.time()
+            if not self._select():
+                if self._config is None:
+                    raise RuntimeError(f"No healthy model available from allowlist {self.allowlist}")
+                print(f"✗ No healthy model found on refresh, keeping {self._selected[0]} ({self._selected[1]})")
+
+    def refresh(self) -> None:
+        """Re-probe the allowlisted models that the endpoint lists and select the fastest."""
+        with self._refresh_lock:
+            self._refresh()
+
+    def current(self):
+        """
+        Return the model configuration to use, refreshing the choice if it is stale.
+        Only the first selection blocks callers; a periodic refresh runs in whichever
+        caller notices it is due while the others keep using the current model.
+        """
+        with self._lock:
+            config = self._config
+            stale = config is None or time.time() - self._refreshed_at > self.refresh_interval
+        if not stale:
+            return config
+
+        if config is None:
+            with self._refresh_lock:
+                if self._config is None:
+                    self._refresh()
+        elif self._refresh_lock.acquire(blocking=False):
+            try:
+                self._refresh()
+            finally:
+                self._refresh_lock.release()
+
+        with self._lock:
+            return self._config
+
+    @property
+    def selected(self) -> Optional[Tuple[str, str]]:
+        """The (name, provider) pair currently in use, or None before the first selection."""
+        with self._lock:
+            return self._selected
+
+    def report_success(self, model) -> None:
+        """Reset the failure count after a successful call."""
+        with self._lock:
+            if model is self._config:
+                self._failures = 0
+
+    def report_failure(self, model) -> None:
+        """Count a failed call; fail over to the next fastest model after max_failures in a row."""
+        with self._lock:
+            if model is not self._config:
+                return
+            self._failures += 1
+            if self._failures >= self.max_failures:
+                failed = self._selected
+                print(f"✗ Model {failed[0]} ({failed[1]}) failed {self._failures} times in a row, failing over")
+                self.latencies[failed] = None
+                if not self._select(exclude=failed):
+                    print(f"✗ No other healthy model available, staying on {failed[0]} ({failed[1]})")
+                    self._failures = 0
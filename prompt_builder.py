@@ -139,4 +139,108 @@ Do not include any commentary, markdown formatting, or text outside the JSON.
 ### INPUT TEXT
 {bot_response}
 
-"""
\ No newline at end of file
+"""
+
+def build_combined_classification_prompt(paired_interaction):
+    """
+    Build a single prompt that classifies both sides of a paired turn: the bot message's
+    Socratic question type and the student's engagement labels.
+    
+    Args:
+        paired_interaction: Dictionary-like pair containing bot and student interaction data
+    
+    Returns:
+        Formatted prompt string for LLM analysis
+    """
+    bot_message = paired_interaction.get('bot_text', '')
+    student_response = paired_interaction.get('student_text', '')
+    
+    return f"""You are a trained discourse analyst specializing in Socratic dialogue, critical thinking and educational game design. Your task is to evaluate a single interaction turn between a student and a GenAI Socratic tutoring bot.
+
+You will be given:
+- The bot's message (which may include explanatory statements and one or more questions)
+- The student's immediate response
+
+You must complete **two analyses** and return them together in one JSON object.
+
+---
+
+### STEP 1 — Read the Bot and Student Turn
+
+BOT: {bot_message}
+
+STUDENT: {student_response}
+
+---
+
+### STEP 2 — Analyze the Bot Message
+
+**2a. Separate Question and Non-Question Parts**
+- Identify all text segments in the BOT message that are genuine **questions** (ending with a question mark “?”).
+- Combine all questions into a single contiguous block called **Question_Part**.
+- Combine the remaining statements, explanations, or feedback into **NonQuestion_Part**.
+- Do not paraphrase or remove punctuation — preserve wording exactly.
+
+**2b. Classify the Question Portion Collectively**
+Treat all questions together as a single Socratic act and classify them using the **six Socratic question types** from *Richard Paul & Linda Elder (2006)*. Choose **one** label that best describes the dominant intent of the combined Question_Part.
+
+| Label | Focus | Example |
+|--------|--------|----------|
+| **Clarification** | Seeks meaning, restatement, or examples | “What do you mean by that?” |
+| **Assumptions** | Probes what is taken for granted | “What are you assuming?” |
+| **Reasons_Evidence** | Asks for justification or proof | “What evidence supports that idea?” |
+| **Viewpoints** | Invites alternative perspectives | “How might someone else view this?” |
+| **Implications** | Explores consequences or logical outcomes | “If that is true, what follows?” |
+| **Meta** | Reflects on the question or process itself | “Why is this question important?” |
+| **Other** | Use only if there is no question or it does not fit any category | [No example required] |
+
+**Always prefer one of the six Socratic categories when a question is present. Use "Other" only when the input lacks questions or is completely out of scope.**
+
+For the chosen label, provide a **rationale** (one concise sentence, 10–25 words) and a **confidence** score between 0 and 1.
+
+---
+
+### STEP 3 — Analyze the Student Response in Context
+
+Select any of the following labels that apply to the **student's turn** (you may assign more than one if appropriate):
+
+| **Label** | **Description** |
+|----------|------------------|
+| **Narrative Participation** | The student engages with the story world by making choices, describing setting or events, staying in character, or proposing story actions. |
+| **Factual Explanation** | The student provides a correct or relevant explanation of a scientific concept, summary, or observation. |
+| **Incorrect Attempt** | The student attempts to answer but provides factually incorrect or confused information. |
+| **IDK / Not Sure** | The student explicitly expresses uncertainty or gives a non-answer (e.g., “I don’t know”, “not sure”). |
+
+For each label you assign, write a brief explanation (max 25 words) explaining why it fits the student’s response. Do not include labels that do not apply.
+
+---
+
+### STEP 4 — Output Format (strict JSON)
+
+Return one JSON object with the following keys:
+- "non_question_part" — all non-question sentences of the BOT message.
+- "question_part" — all question sentences of the BOT message combined into one string.
+- "socratic_label" — one of: ["Clarification", "Assumptions", "Reasons_Evidence", "Viewpoints", "Implications", "Meta", "Other"].
+- "rationale" — one concise sentence (10–25 words) explaining why the label fits the question part.
+- "confidence" — a numeric score between 0 and 1.
+- "assigned_labels" — a list of {{"label": ..., "reasoning": ...}} objects for the STUDENT response.
+
+Example:
+
+{{
+  "non_question_part": "Great choice! The forest is full of tall trees.",
+  "question_part": "Why do you think the leaves are green?",
+  "socratic_label": "Reasons_Evidence",
+  "rationale": "The question asks the student to justify an observation with a scientific explanation.",
+  "confidence": 0.86,
+  "assigned_labels": [
+    {{
+      "label": "Factual Explanation",
+      "reasoning": "The student accurately explains that chlorophyll absorbs light for photosynthesis."
+    }}
+  ]
+}}
+
+Do not include any commentary, markdown formatting, or text outside the JSON.
+
+"""
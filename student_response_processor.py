@@ -4,11 +4,22 @@ This module handles the pairing logic for each user, skipping first and last int
 """
 
 import pandas as pd
-from typing import List, Dict, Tuple
+import numpy as np
+from typing import List, Dict, Tuple, Callable
+from functools import partial
 import json
 import time
 from prompt_builder import build_student_response_classification_prompt
-from llm_utils import process_llm_response
+from llm_scheduler import LLMScheduler, LLMRequest, get_scheduler, PRIORITY_BULK
+from input_processing import (
+    interaction_sort_key,
+    load_watermarks,
+    save_watermarks,
+    select_new_interactions,
+    default_watermark_path
+)
+from label_analytics import student_label_distribution, per_user_stats
+from dry_run import run_dry_run
 
 
 def read_input_file(file_path: str) -> pd.DataFrame:
@@ -24,33 +35,114 @@ def read_input_file(file_path: str) -> pd.DataFrame:
     return pd.read_csv(file_path)
 
 
-def pair_bot_student_interactions(df: pd.DataFrame) -> List[Dict[str, any]]:
+class PairedInteraction:
+    """
+    A bot response paired with the student query that answers it.
+    
+    Uses __slots__ and keeps references to the text objects already held by the source
+    DataFrame instead of copying them, so large exports do not hold a second and third
+    copy of every turn. Supports dictionary-style access for existing callers.
+    """
+    
+    __slots__ = ('user_id', 'pair_index', 'bot_interaction_id', 'student_interaction_id',
+                 'bot_text', 'student_text', 'bot_timestamp', 'student_timestamp')
+    
+    def __init__(self, user_id, pair_index, bot_interaction_id, student_interaction_id,
+                 bot_text, student_text, bot_timestamp='', student_timestamp=''):
+        self.user_id = user_id
+        self.pair_index = pair_index
+        self.bot_interaction_id = bot_interaction_id
+        self.student_interaction_id = student_interaction_id
+        self.bot_text = bot_text
+        self.student_text = student_text
+        self.bot_timestamp = bot_timestamp
+        self.student_timestamp = student_timestamp
+    
+    @property
+    def paired_text(self) -> str:
+        """Combined bot and student text, built on demand (used as the error fallback)."""
+        return f"Bot Response: {self.bot_text}\n\nStudent Query: {self.student_text}"
+    
+    @property
+    def text_length(self) -> int:
+        """Length of the bot and student text, used to order LLM calls without building the prompt."""
+        return sum(len(text) for text in (self.bot_text, self.student_text) if isinstance(text, str))
+    
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+    
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+    
+    def to_dict(self) -> Dict[str, any]:
+        paired_interaction = {name: getattr(self, name) for name in self.__slots__}
+        paired_interaction['paired_text'] = self.paired_text
+        return paired_interaction
+    
+    def __repr__(self):
+        return f"PairedInteraction({self.bot_interaction_id!r} + {self.student_interaction_id!r})"
+
+
+def pair_bot_student_interactions(df: pd.DataFrame, watermarks: Dict[str, int] = None) -> List[PairedInteraction]:
     """
     Pair bot responses with student queries for each user.
     Skips first and last interaction IDs for each user as they are invalid.
     
+    Rows are located through position arrays into the source DataFrame's columns, so
+    no per-user copies of the DataFrame or per-row Series are created.
+    
+    When watermarks are given, pairing still runs over each user's full history so that
+    the last bot turn of a previous run pairs with the first new student reply, but only
+    pairs whose student query lies past the user's watermark are returned.
+    
     Args:
         df: DataFrame containing all interactions
+        watermarks: Optional dictionary mapping Asurite to the highest numeric
+            Interaction ID already processed
     
     Returns:
-        List of dictionaries containing paired interactions
+        List of PairedInteraction records
     """
     paired_interactions = []
     
-    # Group interactions by user (Asurite)
-    user_groups = df.groupby('Asurite')
-    
-    for user_id, user_df in user_groups:
-        print(f"Processing user: {user_id}")
+    # Sort positions by user, then by the numeric part of the Interaction ID
+    # to maintain chronological order (rows without a user are ignored, as in groupby)
+    order_df = pd.DataFrame({
+        'Asurite': df['Asurite'].to_numpy(),
+        'sort_key': interaction_sort_key(df['Interaction ID']).to_numpy()
+    })
+    order_df = order_df[order_df['Asurite'].notna()].sort_values(['Asurite', 'sort_key'], kind='stable')
+    positions = order_df.index.to_numpy()
+    
+    # Column arrays in sorted order; object columns only hold references to the text
+    user_ids = order_df['Asurite'].to_numpy()
+    sort_keys = order_df['sort_key'].to_numpy()
+    interaction_ids = df['Interaction ID'].to_numpy()[positions]
+    interaction_types = df['Interaction Type'].to_numpy()[positions]
+    texts = df['Text'].to_numpy()[positions]
+    timestamps = df['Timestamp'].to_numpy()[positions] if 'Timestamp' in df.columns else None
+    
+    # Boundaries of each user's contiguous block
+    boundaries = np.flatnonzero(user_ids[1:] != user_ids[:-1]) + 1
+    starts = np.concatenate(([0], boundaries)) if len(user_ids) else np.array([], dtype=int)
+    ends = np.concatenate((boundaries, [len(user_ids)])) if len(user_ids) else np.array([], dtype=int)
+    
+    for start, end in zip(starts, ends):
+        user_id = user_ids[start]
+        watermark = watermarks.get(str(user_id)) if watermarks else None
+        if watermark is not None and sort_keys[end - 1] <= watermark:
+            # Nothing new for this user since the last run
+            continue
         
-        # Sort by Interaction ID to maintain chronological order
-        # Extract numeric part for proper sorting
-        user_df['sort_key'] = user_df['Interaction ID'].str.extract(r'(\d+)$').astype(int)
-        user_df_sorted = user_df.sort_values('sort_key')
+        print(f"Processing user: {user_id}")
         
         # Get bot responses and student queries for this user
-        user_bot_responses = user_df_sorted[user_df_sorted['Interaction Type'] == 'Bot Response']
-        user_student_queries = user_df_sorted[user_df_sorted['Interaction Type'] == 'Student Query']
+        user_types = interaction_types[start:end]
+        user_bot_responses = np.flatnonzero(user_types == 'Bot Response') + start
+        user_student_queries = np.flatnonzero(user_types == 'Student Query') + start
         
         print(f"  Total bot responses: {len(user_bot_responses)}")
         print(f"  Total student queries: {len(user_student_queries)}")
@@ -58,9 +150,9 @@ def pair_bot_student_interactions(df: pd.DataFrame) -> List[Dict[str, any]]:
         # Skip first student (invalid) and last bot (no pair possible)
         if len(user_bot_responses) > 0 and len(user_student_queries) > 1:
             # Remove first student query (invalid)
-            user_student_queries_filtered = user_student_queries.iloc[1:]
+            user_student_queries_filtered = user_student_queries[1:]
             # Remove last bot response (no student to pair with)
-            user_bot_responses_filtered = user_bot_responses.iloc[:-1]
+            user_bot_responses_filtered = user_bot_responses[:-1]
             
             print(f"  After filtering - Bot responses: {len(user_bot_responses_filtered)}")
             print(f"  After filtering - Student queries: {len(user_student_queries_filtered)}")
@@ -68,26 +160,32 @@ def pair_bot_student_interactions(df: pd.DataFrame) -> List[Dict[str, any]]:
             # Pair bot responses with student queries
             min_length = min(len(user_bot_responses_filtered), len(user_student_queries_filtered))
             
-            for i in range(min_length):
-                bot_response = user_bot_responses_filtered.iloc[i]
-                student_query = user_student_queries_filtered.iloc[i]
+            # Skip pairs whose student query was already labeled in a previous run
+            first_new = 0
+            if watermark is not None:
+                student_keys = sort_keys[user_student_queries_filtered[:min_length]]
+                first_new = int((student_keys <= watermark).sum())
+                print(f"  Watermark {watermark}: {min_length - first_new} new pairs")
+            
+            for i in range(first_new, min_length):
+                bot_pos = user_bot_responses_filtered[i]
+                student_pos = user_student_queries_filtered[i]
                 
                 # Create paired interaction
-                paired_interaction = {
-                    'user_id': user_id,
-                    'pair_index': i + 1,
-                    'bot_interaction_id': bot_response['Interaction ID'],
-                    'student_interaction_id': student_query['Interaction ID'],
-                    'bot_text': bot_response['Text'],
-                    'student_text': student_query['Text'],
-                    'bot_timestamp': bot_response.get('Timestamp', ''),
-                    'student_timestamp': student_query.get('Timestamp', ''),
-                    'paired_text': f"Bot Response: {bot_response['Text']}\n\nStudent Query: {student_query['Text']}"
-                }
+                paired_interaction = PairedInteraction(
+                    user_id=user_id,
+                    pair_index=i + 1,
+                    bot_interaction_id=interaction_ids[bot_pos],
+                    student_interaction_id=interaction_ids[student_pos],
+                    bot_text=texts[bot_pos],
+                    student_text=texts[student_pos],
+                    bot_timestamp=timestamps[bot_pos] if timestamps is not None else '',
+                    student_timestamp=timestamps[student_pos] if timestamps is not None else ''
+                )
                 
                 paired_interactions.append(paired_interaction)
                 
-                print(f"    Pair {i+1}: {bot_response['Interaction ID']} + {student_query['Interaction ID']}")
+                print(f"    Pair {i+1}: {interaction_ids[bot_pos]} + {interaction_ids[student_pos]}")
         else:
             print(f"  Skipping user {user_id} - insufficient interactions for pairing (need at least 1 bot response and 2 student queries)")
     
@@ -96,37 +194,77 @@ def pair_bot_student_interactions(df: pd.DataFrame) -> List[Dict[str, any]]:
 
 
 
-def analyze_student_responses_with_llm(paired_interactions: List[Dict[str, any]], model) -> Dict[str, Dict[str, any]]:
+def paired_watermarks(paired_interactions: List[PairedInteraction], watermarks: Dict[str, int]) -> Dict[str, int]:
+    """
+    Advance each user's watermark to the last student query that was paired.
+    
+    Rows after that query (e.g. a student query whose bot reply has not arrived yet)
+    are left past the watermark so the next incremental run pairs and labels them.
+    
+    Args:
+        paired_interactions: Pairs labeled in this run
+        watermarks: Existing watermarks (not modified)
+    
+    Returns:
+        New dictionary of watermarks
+    """
+    updated = dict(watermarks)
+    if not paired_interactions:
+        return updated
+    student_ids = pd.Series([pair['student_interaction_id'] for pair in paired_interactions])
+    user_ids = [str(pair['user_id']) for pair in paired_interactions]
+    for user_id, mark in zip(user_ids, interaction_sort_key(student_ids)):
+        updated[user_id] = max(int(mark), updated.get(user_id, -1))
+    return updated
+
+
+def pair_llm_request(pair: PairedInteraction, build_prompt: Callable[[PairedInteraction], str],
+                     interaction_type: str) -> LLMRequest:
+    """
+    Build a lazy scheduler request for a pair: the prompt is built by the worker that runs
+    the call, and the paired text only if the call fails.
+    
+    Args:
+        pair: The paired interaction
+        build_prompt: Prompt builder taking the pair (e.g. build_student_response_classification_prompt)
+        interaction_type: "student" or "combined"
+    
+    Returns:
+        LLMRequest keyed by the student interaction ID
+    """
+    return LLMRequest(partial(build_prompt, pair), interaction_type, pair.student_interaction_id,
+                      partial(getattr, pair, 'paired_text'), pair.text_length)
+
+
+def analyze_student_responses_with_llm(paired_interactions: List[PairedInteraction], model,
+                                       scheduler: LLMScheduler = None, priority: int = PRIORITY_BULK) -> Dict[str, Dict[str, any]]:
     """
     Analyze student responses using LLM and return results mapped by student interaction ID.
     
     Args:
         paired_interactions: List of paired bot-student interactions
         model: The LLM model configuration
+        scheduler: Scheduler used to run the LLM calls (defaults to the shared one)
+        priority: Queue priority, e.g. PRIORITY_INTERACTIVE to run ahead of bulk batches
+            queued on the same scheduler in this process
     
     Returns:
         Dictionary mapping student interaction IDs to their analysis results
     """
-    student_analysis_results = {}
+    scheduler = scheduler or get_scheduler()
     
     print(f"\n=== Analyzing Student Responses with LLM ===")
     print(f"Processing {len(paired_interactions)} bot-student pairs...")
     
-    for i, pair in enumerate(paired_interactions):
-        student_interaction_id = pair['student_interaction_id']
-        paired_text = pair['paired_text']
-        
-        print(f"Processing pair {i+1}/{len(paired_interactions)}: {student_interaction_id}")
-        print(f"Bot: {pair['bot_interaction_id']}")
-        print(f"Student: {student_interaction_id}")
-        print(f"Student text: {pair['student_text'][:100]}...")
-        
-        # Build prompt and process with LLM
-        llm_prompt = build_student_response_classification_prompt(pair)
-        result = process_llm_response(model, llm_prompt, "student", student_interaction_id, paired_text)
-        
-        # Store result with student interaction ID as key
-        student_analysis_results[student_interaction_id] = result
+    # Prompts are built as workers take the calls; the scheduler dispatches the longest ones first
+    requests = [pair_llm_request(pair, build_student_response_classification_prompt, "student")
+                for pair in paired_interactions]
+    results = scheduler.run_batch(model, requests, priority)
+    
+    # Store results with student interaction ID as key
+    student_analysis_results = {
+        pair['student_interaction_id']: result for pair, result in zip(paired_interactions, results)
+    }
     
     print(f"✓ Completed LLM analysis for {len(student_analysis_results)} student responses")
     return student_analysis_results
@@ -185,18 +323,31 @@ def enhance_dataframe_with_student_analysis(df: pd.DataFrame, student_analysis_r
 
 
 
-def process_all_users_student_analysis(input_file_path: str, model, output_file_path: str = "Output/all_users_student_analysis.csv") -> pd.DataFrame:
+def process_all_users_student_analysis(input_file_path: str, model, output_file_path: str = "Output/all_users_student_analysis.csv",
+                                       incremental: bool = False, watermark_path: str = None,
+                                       dry_run: bool = False, sample_fraction: float = 0.05) -> pd.DataFrame:
     """
     Process all users' student responses with LLM analysis and output to CSV.
     Similar to test_first_user_student_analysis but for all users.
     
+    In incremental mode only interactions past each user's stored watermark are paired
+    and labeled, and the new rows are appended to the existing output file. The watermark
+    is each user's last paired student query, so rows after it are written (and labeled)
+    by a later run once their pair exists.
+    
     Args:
         input_file_path: Path to the input CSV file
         model: The LLM model configuration
         output_file_path: Path where to save the CSV file
+        incremental: If True, only process interactions added since the previous run
+        watermark_path: Path to the watermark JSON file (defaults to one next to the output file)
+        dry_run: If True, label a stratified sample of users and project the full run
+            instead of processing the whole file (nothing is written)
+        sample_fraction: Fraction of users sampled in dry-run mode
     
     Returns:
-        Enhanced DataFrame with student analysis
+        Enhanced DataFrame with student analysis (only the new rows in incremental mode,
+        a one-row projection in dry-run mode)
     """
     # Start timing
     start_time = time.time()
@@ -215,18 +366,42 @@ def process_all_users_student_analysis(input_file_path: str, model, output_file_
         print(f"Error: Missing required columns: {missing_columns}")
         return df
     
-    # Get unique users
-    unique_users = df['Asurite'].unique()
-    print(f"Found {len(unique_users)} unique users: {list(unique_users)}")
+    if dry_run:
+        projection = run_dry_run(
+            df,
+            lambda sample_df: analyze_student_responses_with_llm(pair_bot_student_interactions(sample_df), model),
+            "student",
+            sample_fraction,
+            model=model
+        )
+        return pd.DataFrame([projection])
+    
+    # Pair bot and student interactions for all users (past the stored watermarks)
+    watermarks = None
+    if incremental:
+        watermark_path = watermark_path or default_watermark_path(output_file_path)
+        watermarks = load_watermarks(watermark_path)
+        print(f"Incremental mode: {len(watermarks)} known users")
     
-    # Pair bot and student interactions for all users
     print(f"\n=== Pairing Bot and Student Interactions for All Users ===")
-    paired_interactions = pair_bot_student_interactions(df)
-    
-    if not paired_interactions:
+    paired_interactions = pair_bot_student_interactions(df, watermarks)
+    
+    output_df = df
+    if incremental:
+        # Output rows up to each user's last paired student query; later rows wait for their pair
+        new_watermarks = paired_watermarks(paired_interactions, watermarks)
+        output_df = select_new_interactions(df, watermarks, upto=new_watermarks)
+        print(f"Incremental mode: {len(output_df)} new rows up to the last paired student query")
+        if not paired_interactions:
+            print("No new paired interactions since the last run.")
+            return output_df
+    elif not paired_interactions:
         print("No paired interactions found.")
         return df
     
+    # Get unique users
+    unique_users = output_df['Asurite'].unique()
+    print(f"Found {len(unique_users)} unique users: {list(unique_users)}")
     print(f"Found {len(paired_interactions)} total paired interactions across all users")
     
     
@@ -236,14 +411,22 @@ def process_all_users_student_analysis(input_file_path: str, model, output_file_
     
     # Enhance DataFrame with analysis results
     print(f"\n=== Enhancing DataFrame with Analysis Results ===")
-    enhanced_df = enhance_dataframe_with_student_analysis(df, student_analysis_results)
+    enhanced_df = enhance_dataframe_with_student_analysis(output_df, student_analysis_results)
     
     # Save results to CSV
     print(f"\n=== Saving Results ===")
     import os
     os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
-    enhanced_df.to_csv(output_file_path, index=False)
-    print(f"Enhanced data saved to {output_file_path}")
+    if incremental and os.path.exists(output_file_path):
+        enhanced_df.to_csv(output_file_path, mode='a', header=False, index=False)
+        print(f"Appended {len(enhanced_df)} new rows to {output_file_path}")
+    else:
+        enhanced_df.to_csv(output_file_path, index=False)
+        print(f"Enhanced data saved to {output_file_path}")
+    
+    if incremental:
+        save_watermarks(watermark_path, new_watermarks)
+        print(f"Watermarks saved to {watermark_path}")
     
     # Summary
     print(f"\n=== Summary ===")
@@ -261,28 +444,17 @@ def process_all_users_student_analysis(input_file_path: str, model, output_file_
         print(f"- Average labels per student: {student_rows['label_count'].mean():.1f}")
         
         # Show most common labels across all users
-        all_labels = []
-        for idx, row in student_rows.iterrows():
-            if row['labels'] != 'No labels assigned':
-                labels_text = row['labels']
-                label_names = [label.strip() for label in labels_text.split(';')]
-                all_labels.extend(label_names)
-        
-        if all_labels:
-            from collections import Counter
-            label_counts = Counter(all_labels)
+        label_counts = student_label_distribution(student_rows)
+        if len(label_counts) > 0:
             print(f"\nMost Common Labels Across All Users:")
-            for label, count in label_counts.most_common(10):
+            for label, count in zip(label_counts['label'].head(10), label_counts['count'].head(10)):
                 print(f"  - {label}: {count}")
         
         # Show label distribution by user
         print(f"\nLabel Distribution by User:")
-        for user_id in unique_users:
-            user_student_rows = student_rows[enhanced_df['Asurite'] == user_id]
-            if len(user_student_rows) > 0:
-                user_students_with_labels = len(user_student_rows[user_student_rows['label_count'] > 0])
-                avg_labels = user_student_rows['label_count'].mean()
-                print(f"  {user_id}: {user_students_with_labels}/{len(user_student_rows)} students with labels (avg: {avg_labels:.1f})")
+        user_stats = per_user_stats(student_rows)
+        for stats in user_stats.itertuples():
+            print(f"  {stats.Index}: {stats.students_with_labels}/{stats.student_queries} students with labels (avg: {stats.avg_labels:.1f})")
     
     # Calculate and display execution time
     end_time = time.time()
@@ -297,16 +469,21 @@ def process_all_users_student_analysis(input_file_path: str, model, output_file_
 
 if __name__ == "__main__":
     # Process all users' student responses with LLM analysis
-    from config import TEST_LLMs_API_ACCESS_TOKEN, TEST_LLMs_REST_API_URL
-    from ASUllmAPI import ModelConfig
+    from model_registry import ModelSelector
+    from llm_utils import enable_hedging
     
     # Define the model
-    model = ModelConfig(name="gpt4_1",
-                        provider="openai",
-                        access_token=TEST_LLMs_API_ACCESS_TOKEN,
-                        api_url=TEST_LLMs_REST_API_URL)
+    model = ModelSelector()
     
     input_file = "Input/Chronicles_sequential_interactions.csv"
     output_file = "Output/Chronicles_student_labels.csv"
+    incremental = False  # set to True to only label interactions added since the last run
+    hedging = False  # set to True to send a duplicate request for calls slower than the observed p95
+    dry_run = False  # set to True to label a sample and project time, calls and cost for the full file
+    
+    if hedging:
+        hedger = enable_hedging(hedge_budget=0.05)
     
-    enhanced_df = process_all_users_student_analysis(input_file, model, output_file)
+    enhanced_df = process_all_users_student_analysis(input_file, model, output_file, incremental=incremental, dry_run=dry_run)
+    if hedging:
+        hedger.report()
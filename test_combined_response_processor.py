@@ -0,0 +1,61 @@
+"""
+Tests that combined bot+student responses end up in the right output rows.
+"""
+
+import pandas as pd
+import llm_scheduler
+from llm_utils import error_placeholder
+from combined_response_processor import process_all_users_combined_analysis
+
+
+def fake_process_llm_response(model, prompt, interaction_type, interaction_id, interaction_text):
+    """Answer like the LLM would, failing the combined call for u1_5 instead of calling the API."""
+    if interaction_type == "bot":
+        return {"socratic_label": "Closing", "rationale": "last turn", "confidence": 0.5}
+    if interaction_id == "u1_5":
+        return error_placeholder("combined", interaction_text(), ValueError("LLM returned no response"))
+    return {
+        "socratic_label": "Probing",
+        "rationale": "asks for evidence",
+        "confidence": 0.9,
+        "assigned_labels": [
+            {"label": "Factual Explanation", "reasoning": "explains"},
+            {"label": "IDK / Not Sure", "reasoning": "hedges"}
+        ]
+    }
+
+
+def test_combined_labels_split_into_bot_and_student_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(llm_scheduler, 'process_llm_response', fake_process_llm_response)
+
+    pd.DataFrame({
+        'Asurite': ['u1'] * 6,
+        'Interaction ID': [f"u1_{number}" for number in range(1, 7)],
+        'Interaction Type': ['Student Query', 'Bot Response'] * 3,
+        'Text': ['S1', 'B2', 'S3', 'B4', 'S5', 'B6']
+    }).to_csv("input.csv", index=False)
+
+    process_all_users_combined_analysis("input.csv", None, "Output/combined.csv")
+    output = pd.read_csv("Output/combined.csv").set_index('Interaction ID')
+
+    # Pair B2 + S3 was parsed: the bot label goes on the bot row, the student labels on the student row
+    assert output.loc['u1_2', 'socratic_label'] == 'Probing'
+    assert output.loc['u1_3', 'labels'] == 'Factual Explanation; IDK / Not Sure'
+    assert pd.isna(output.loc['u1_2', 'labels'])
+    assert pd.isna(output.loc['u1_3', 'socratic_label'])
+
+    # Pair B4 + S5 failed: both rows get the error placeholder
+    assert output.loc['u1_4', 'socratic_label'] == 'Error'
+    assert output.loc['u1_5', 'labels'] == 'Error'
+
+    # The last bot turn has no pair and is labeled with a bot-only call
+    assert output.loc['u1_6', 'socratic_label'] == 'Closing'
+
+
+def test_missing_columns_are_reported_instead_of_raising(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pd.DataFrame({'Bot Response': ['B1', 'B2']}).to_csv("old_format.csv", index=False)
+
+    df = process_all_users_combined_analysis("old_format.csv", None, "Output/combined.csv")
+    assert list(df.columns) == ['Bot Response']
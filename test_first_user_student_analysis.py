@@ -11,8 +11,8 @@ from student_response_processor import (
     analyze_student_responses_with_llm,
     enhance_dataframe_with_student_analysis
 )
-from config import TEST_LLMs_API_ACCESS_TOKEN, TEST_LLMs_REST_API_URL
-from ASUllmAPI import ModelConfig
+from llm_scheduler import PRIORITY_INTERACTIVE
+from model_registry import ModelSelector
 
 
 def test_first_user_student_analysis():
@@ -21,10 +21,7 @@ def test_first_user_student_analysis():
     print("=== Testing First User Student Response Analysis ===")
     
     # Define the model
-    model = ModelConfig(name="gpt4_1",
-                        provider="openai",
-                        access_token=TEST_LLMs_API_ACCESS_TOKEN,
-                        api_url=TEST_LLMs_REST_API_URL)
+    model = ModelSelector()
     
     # Read input file
     input_file_path = "Input/Chronicles_sequential_interactions.csv"
@@ -70,7 +67,8 @@ def test_first_user_student_analysis():
     
     # Analyze student responses with LLM
     print(f"=== Analyzing Student Responses with LLM ===")
-    student_analysis_results = analyze_student_responses_with_llm(paired_interactions, model)
+    # Interactive priority only matters if bulk work is queued in this same process
+    student_analysis_results = analyze_student_responses_with_llm(paired_interactions, model, priority=PRIORITY_INTERACTIVE)
     
     # Show analysis results
     print(f"\n=== LLM Analysis Results ===")
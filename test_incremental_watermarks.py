@@ -0,0 +1,73 @@
+"""
+Regression test: an incremental run over a growing export must assign the same student
+labels as a single full run over the final export.
+"""
+
+import pandas as pd
+import student_response_processor
+from student_response_processor import process_all_users_student_analysis
+
+
+def fake_analyze_student_responses_with_llm(paired_interactions, model, **kwargs):
+    """Label each student query with the bot turn it was paired with, instead of calling the LLM."""
+    return {
+        pair['student_interaction_id']: {
+            'assigned_labels': [{'label': f"after {pair['bot_interaction_id']}", 'reasoning': ''}]
+        }
+        for pair in paired_interactions
+    }
+
+
+def write_interactions(path, turns):
+    rows = [
+        {
+            'Asurite': user_id,
+            'Interaction ID': f"{user_id}_{number}",
+            'Interaction Type': 'Student Query' if kind == 'S' else 'Bot Response',
+            'Text': f"{kind}{number} from {user_id}"
+        }
+        for user_id, kind, number in turns
+    ]
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def student_labels(output_path):
+    df = pd.read_csv(output_path)
+    students = df[df['Interaction Type'] == 'Student Query']
+    return dict(zip(students['Interaction ID'], students['labels'].fillna('')))
+
+
+def test_incremental_run_matches_full_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(student_response_processor, 'analyze_student_responses_with_llm',
+                        fake_analyze_student_responses_with_llm)
+
+    first_export = [('u1', 'S', 1), ('u1', 'B', 2), ('u1', 'S', 3), ('u1', 'B', 4), ('u1', 'S', 5),
+                    ('u2', 'S', 1), ('u2', 'B', 2)]
+    full_export = first_export + [('u1', 'B', 6), ('u1', 'S', 7), ('u1', 'B', 8),
+                                  ('u2', 'S', 3), ('u2', 'B', 4), ('u2', 'S', 5), ('u2', 'B', 6)]
+
+    first_input = tmp_path / "first.csv"
+    full_input = tmp_path / "full.csv"
+    write_interactions(first_input, first_export)
+    write_interactions(full_input, full_export)
+
+    incremental_output = str(tmp_path / "Output" / "incremental.csv")
+    full_output = str(tmp_path / "Output" / "full.csv")
+
+    process_all_users_student_analysis(str(first_input), None, incremental_output, incremental=True)
+    process_all_users_student_analysis(str(full_input), None, incremental_output, incremental=True)
+    process_all_users_student_analysis(str(full_input), None, full_output)
+
+    incremental_labels = student_labels(incremental_output)
+    full_labels = student_labels(full_output)
+
+    # No row is written twice, and every row written incrementally has the full-run label
+    assert len(pd.read_csv(incremental_output)['Interaction ID'].unique()) == len(pd.read_csv(incremental_output))
+    for interaction_id, labels in incremental_labels.items():
+        assert labels == full_labels[interaction_id]
+
+    # Every student query labeled by the full run is labeled by the incremental runs too
+    labeled_in_full = {interaction_id for interaction_id, labels in full_labels.items() if labels}
+    labeled_incrementally = {interaction_id for interaction_id, labels in incremental_labels.items() if labels}
+    assert labeled_in_full == labeled_incrementally
+    assert full_labels['u1_5'] == 'after u1_4'
@@ -0,0 +1,43 @@
+"""
+Tests for the label analytics tables on a small combined output.
+"""
+
+import pandas as pd
+from label_analytics import (
+    combine_labeled_outputs,
+    student_label_distribution,
+    bot_student_crosstab,
+    compute_label_analytics
+)
+
+
+def combined_output():
+    # u1_4 has two labels, as the student prompt allows
+    return combine_labeled_outputs(student_df=pd.DataFrame({
+        'Asurite': ['u1', 'u1', 'u1', 'u1', 'u2', 'u2'],
+        'Interaction ID': ['u1_1', 'u1_2', 'u1_3', 'u1_4', 'u2_1', 'u2_2'],
+        'Interaction Type': ['Student Query', 'Bot Response', 'Student Query', 'Bot Response',
+                             'Bot Response', 'Student Query'],
+        'socratic_label': ['', 'Probing', '', 'Meta', 'Probing', ''],
+        'labels': ['', '', 'Factual Explanation; IDK / Not Sure', '', '', 'IDK / Not Sure'],
+        'label_count': [0, 0, 2, 0, 0, 1]
+    }))
+
+
+def test_multi_label_student_rows_are_counted_once_per_label():
+    distribution = student_label_distribution(combined_output()).set_index('label')['count']
+    assert distribution.to_dict() == {'IDK / Not Sure': 2, 'Factual Explanation': 1}
+
+
+def test_crosstab_matches_each_student_label_to_the_preceding_bot_label():
+    crosstab = bot_student_crosstab(combined_output())
+    assert crosstab.loc['Probing', 'Factual Explanation'] == 1
+    assert crosstab.loc['Probing', 'IDK / Not Sure'] == 2
+    assert 'Meta' not in crosstab.index
+
+
+def test_compute_label_analytics_builds_every_table():
+    tables = compute_label_analytics(combined_output())
+    assert set(tables) == {'student_label_distribution', 'bot_label_distribution',
+                           'per_user_stats', 'bot_student_crosstab'}
+    assert tables['per_user_stats'].loc['u1', 'students_with_labels'] == 1
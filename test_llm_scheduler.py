@@ -0,0 +1,47 @@
+"""
+Tests for the LLM scheduler's dispatch order, lazy prompts and saved latency model.
+"""
+
+import llm_scheduler
+from llm_scheduler import LLMScheduler, LLMRequest, LatencyModel
+
+
+def test_batch_runs_longest_first_and_builds_prompts_lazily(monkeypatch):
+    dispatched = []
+
+    def fake_process_llm_response(model, prompt, interaction_type, interaction_id, interaction_text):
+        dispatched.append(interaction_id)
+        return {'prompt': prompt}
+
+    monkeypatch.setattr(llm_scheduler, 'process_llm_response', fake_process_llm_response)
+    built = []
+
+    def build_prompt(text):
+        built.append(text)
+        return f"Label: {text}"
+
+    texts = ['a' * 10, 'b' * 300, 'c' * 40, 'd' * 2000]
+    requests = [LLMRequest(lambda text=text: build_prompt(text), "bot", f"id_{i}", text)
+                for i, text in enumerate(texts)]
+    assert built == []
+
+    scheduler = LLMScheduler(max_workers=1)
+    results = scheduler.run_batch(None, requests)
+    scheduler.shutdown()
+
+    # Even the first job taken is the longest one, not the first in input order
+    assert dispatched == ['id_3', 'id_1', 'id_2', 'id_0']
+    assert [result['prompt'] for result in results] == [f"Label: {text}" for text in texts]
+
+
+def test_latency_model_is_saved_and_reloaded(tmp_path):
+    path = str(tmp_path / "latency.json")
+    model = LatencyModel(path=path)
+    # Short prompts were slow in an earlier run
+    model.observe("bot", 100, 5.0)
+    model.observe("bot", 2000, 2.0)
+    model.save()
+
+    reloaded = LatencyModel(path=path)
+    assert reloaded.estimate("bot", 100) == model.estimate("bot", 100)
+    assert reloaded.estimate("bot", 100) > reloaded.estimate("bot", 2000)